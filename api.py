@@ -0,0 +1,212 @@
+# Headless JSON forecast API.
+#
+#   GET  /forecast?date=2024-12-12
+#   GET  /forecast?start=2024-12-01&end=2024-12-31
+#   POST /forecast            {"dates": ["2024-12-12", "2025-01-06", ...]}
+#   GET  /health
+#
+# Run it on its own with `python api.py --port 8502`, or set FORECAST_API_PORT
+# to serve it from inside the Streamlit process. Either way it goes through the
+# same cached model and forecast path as the app pages.
+
+import argparse
+import json
+import logging
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+import forecasting
+import warmup
+from prophet_engine import check_days
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8502
+
+# Largest number of days a single request may ask for
+MAX_DATES_PER_REQUEST = 20000
+
+# Largest accepted POST body, in bytes
+MAX_BODY_BYTES = 4 * 1024 * 1024
+
+_DAY = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}')
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def parse_days(values):
+    # Full YYYY-MM-DD strings only: pandas would also read null as NaT, a
+    # number as nanoseconds since the epoch and '2024' as 2024-01-01
+    for value in values:
+        if not isinstance(value, str) or not _DAY.fullmatch(value):
+            raise BadRequest(f"Invalid date {value!r}, expected YYYY-MM-DD")
+    try:
+        return check_days(np.array(values, dtype='datetime64[D]'))
+    except ValueError as e:
+        raise BadRequest(f"Invalid date: {e}")
+
+
+def days_from_query(query):
+    if 'date' in query:
+        return parse_days(query['date'])
+    if 'start' in query and 'end' in query:
+        start, end = parse_days([query['start'][0], query['end'][0]])
+        if end < start:
+            raise BadRequest("end must not be before start")
+        if (end - start).astype(np.int64) + 1 > MAX_DATES_PER_REQUEST:
+            raise BadRequest(f"Ranges are limited to {MAX_DATES_PER_REQUEST} days")
+        return np.arange(start, end + 1)
+    raise BadRequest("Pass either date=YYYY-MM-DD or start=...&end=...")
+
+
+def days_from_body(body):
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise BadRequest(f"Invalid JSON: {e}")
+    if not isinstance(payload, dict) or not isinstance(payload.get('dates'), list):
+        raise BadRequest('Expected a JSON object like {"dates": ["2024-12-12", ...]}')
+    if len(payload['dates']) > MAX_DATES_PER_REQUEST:
+        raise BadRequest(f"Requests are limited to {MAX_DATES_PER_REQUEST} dates")
+    return parse_days(payload['dates'])
+
+
+def forecast_payload(days, timer):
+    with forecasting.use_model(timer=timer) as (model, model_version):
+        forecast = forecasting.forecast_dates(model, model_version, days, timer=timer)
+    with timer.stage('render'):
+        forecasts = [
+            {'date': str(day), 'yhat': yhat, 'yhat_lower': lower, 'yhat_upper': upper}
+            for day, yhat, lower, upper in zip(
+                forecast['ds'].dt.date, forecast['yhat'].tolist(),
+                forecast['yhat_lower'].tolist(), forecast['yhat_upper'].tolist())
+        ]
+    return {'model_version': model_version, 'forecasts': forecasts}
+
+
+class ForecastHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections open between requests (keep-alive); without
+    # Nagle the headers and body go out without waiting on a delayed ACK
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/health':
+            self.respond(200, {'status': 'ok', 'warmup': warmup.status()['state']})
+        elif url.path == '/forecast':
+            self.handle_forecast('get', lambda: days_from_query(parse_qs(url.query)))
+        else:
+            self.respond(404, {'error': f"Unknown path {url.path}"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/forecast':
+            self.respond(404, {'error': f"Unknown path {url.path}"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # The body cannot be found, so neither can the next request
+            self.close_connection = True
+            self.respond(400, {'error': "Invalid Content-Length"})
+            return
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self.respond(413, {'error': f"Body is limited to {MAX_BODY_BYTES} bytes"})
+            return
+        body = self.rfile.read(length)
+        self.handle_forecast('bulk', lambda: days_from_body(body))
+
+    def handle_forecast(self, request, parse):
+        timer = forecasting.StageTimer('api_' + request)
+        try:
+            with timer.stage('frame_build'):
+                days = parse()
+            payload = forecast_payload(days, timer)
+        except BadRequest as e:
+            self.respond(400, {'error': str(e)}, timer)
+            return
+        except Exception:
+            logger.exception("Forecast request failed: %s", self.path)
+            self.respond(500, {'error': 'Internal error'}, timer)
+            return
+        self.respond(200, payload, timer)
+        timer.log(model_version=payload['model_version'], dates=len(payload['forecasts']))
+
+    def respond(self, status, payload, timer=None):
+        if timer is not None:
+            payload['latency_ms'] = round(timer.total * 1000, 3)
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if timer is not None:
+            self.send_header('Server-Timing', ', '.join(
+                f"{name};dur={ms}" for name, ms in timer.as_millis().items()))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    server = ThreadingHTTPServer((host, port), ForecastHandler)
+    server.daemon_threads = True
+    return server
+
+
+_background_server = None
+_background_failed = False
+_background_lock = threading.Lock()
+
+
+def start_background_server(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    # Serve the API from a daemon thread of the current process; safe to call
+    # on every Streamlit rerun, only the first call starts a server. If the
+    # port is taken (another worker on the host serves it), that is logged
+    # once, the app runs without the API and None is returned.
+    global _background_server, _background_failed
+    with _background_lock:
+        if _background_server is None and not _background_failed:
+            try:
+                _background_server = make_server(host, port)
+            except OSError as e:
+                _background_failed = True
+                logger.warning("Forecast API not started, cannot listen on %s:%s: %s", host, port, e)
+                return None
+            threading.Thread(target=_background_server.serve_forever, name='forecast-api', daemon=True).start()
+            logger.info("Forecast API listening on http://%s:%s", host, port)
+    return _background_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve forecasts as JSON over HTTP.")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    warmup.start()
+    server = make_server(args.host, args.port)
+    logger.info("Forecast API listening on http://%s:%s", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,32 @@
 import streamlit as st
-import joblib
-import pandas as pd
-from prophet import Prophet
-import time
-from io import StringIO
+import datetime
+import logging
+import os
+
+import warmup
+
+# pandas, altair and the forecasting stack are imported inside the pages that
+# use them, so the Home and About pages never pay for them
+# (`python import_report.py` shows the per-module import cost)
+
+# Structured timing lines from forecasting.timing go to the server log
+logging.basicConfig(level=logging.INFO)
+
+# Optionally serve the JSON API from this process, sharing its model and forecast caches
+if os.environ.get('FORECAST_API_PORT'):
+    import api
+    api.start_background_server(os.environ.get('FORECAST_API_HOST', api.DEFAULT_HOST),
+                                int(os.environ['FORECAST_API_PORT']))
+
+# Load the model and precompute the next days in the background; the pages
+# answer live until it is done (see warmup.py)
+warmup.start()
+
+# Rows of date range results shown per page
+RANGE_PAGE_SIZE = 100
+
+# Forecasts remembered per session, so reruns from UI-only widgets skip the model
+SESSION_MEMO_SIZE = 8
 
 # Multi-page layout
 def main():
@@ -33,6 +56,9 @@ def home_page():
     st.image("images/eBay-prediction.jpg", use_column_width=True)
 
 def single_day_prediction_page():
+    import pandas as pd
+    import forecasting
+
     st.title('Predict Future Stock Price for a Single Day')
 
     # Dark mode toggle
@@ -79,41 +105,44 @@ def single_day_prediction_page():
 
     st.write("## Enter the date for which you want to predict the stock price")
 
+    # Which series to forecast (the EBAY model unless more are installed under models/)
+    series_id = st.selectbox("Select a series", forecasting.list_series())
+
     # Input for target date
-    target_date = st.date_input("Select a date", value=pd.to_datetime('2024-12-12'))
+    target_date = st.date_input("Select a date", value=datetime.date(2024, 12, 12))
+
+    target_date = pd.to_datetime(target_date)
+    timer = forecasting.StageTimer('single_day')
 
     # Loading indicator while processing
     with st.spinner('Calculating prediction...'):
-        time.sleep(1)  # Simulate loading time
-
-    # Load the trained Prophet model
-    model = joblib.load('prophet.pkl')
-
-    # Convert target date to datetime and set the time to 04:00:00
-    target_date = pd.to_datetime(target_date).replace(hour=4, minute=0, second=0)
-
-    # Define future dates
-    last_date_in_data = model.history['ds'].max()
-    future_periods = (target_date - last_date_in_data).days + 1
-
-    # Create future dataframe
-    future = model.make_future_dataframe(periods=future_periods, freq='D')
-
-    # Make predictions
-    forecast = model.predict(future)
+        # Use the series' current model (cached per process, held until this rerun is done)
+        with forecasting.use_model(series_id, timer) as (model, model_version):
+            # Look up the prediction (session memo first, then the precomputed
+            # forecast table, live model otherwise)
+            selected_row, memo_hit = session_memo(
+                ('single_day', series_id, model_version, target_date),
+                lambda: forecasting.forecast_dates(model, model_version, [target_date], timer=timer,
+                                                   series_id=series_id))
 
     # Display the prediction for the target date
-    selected_row = forecast[forecast['ds'] == target_date]
+    with timer.stage('render'):
+        if not selected_row.empty:
+            st.write(f"## Prediction for {target_date.date()}")
+            st.write(f"**Predicted closing price:** ${selected_row['yhat'].values[0]:.2f}")
+            st.write(f"**Lower bound:** ${selected_row['yhat_lower'].values[0]:.2f}")
+            st.write(f"**Upper bound:** ${selected_row['yhat_upper'].values[0]:.2f}")
+        else:
+            st.write("No prediction available for the selected date.")
 
-    if not selected_row.empty:
-        st.write(f"## Prediction for {target_date}")
-        st.write(f"**Predicted closing price:** ${selected_row['yhat'].values[0]:.2f}")
-        st.write(f"**Lower bound:** ${selected_row['yhat_lower'].values[0]:.2f}")
-        st.write(f"**Upper bound:** ${selected_row['yhat_upper'].values[0]:.2f}")
-    else:
-        st.write("No prediction available for the selected date.")
+    timer.log(series=series_id, model_version=model_version, dates=1, memo_hit=memo_hit)
+    warmup_notice()
+    timings_panel(timer)
 
 def date_range_prediction_page():
+    import pandas as pd
+    import forecasting
+
     st.title('Predict Future Stock Prices for a Date Range')
 
     # Dark mode toggle
@@ -160,60 +189,127 @@ def date_range_prediction_page():
 
     st.write("## Enter the date range for predictions")
 
+    # Which series to forecast (the EBAY model unless more are installed under models/)
+    series_id = st.selectbox("Select a series", forecasting.list_series())
+
     # Input for start and end dates
-    start_date = st.date_input("Select start date", value=pd.to_datetime('2024-12-01'))
-    end_date = st.date_input("Select end date", value=pd.to_datetime('2024-12-31'))
+    start_date = st.date_input("Select start date", value=datetime.date(2024, 12, 1))
+    end_date = st.date_input("Select end date", value=datetime.date(2024, 12, 31))
+
+    start_date = pd.to_datetime(start_date)
+    end_date = pd.to_datetime(end_date)
+    timer = forecasting.StageTimer('date_range')
 
     # Loading indicator while processing
     with st.spinner('Calculating prediction...'):
-        time.sleep(1)  # Simulate loading time
+        # Use the series' current model (cached per process, held until this rerun is done)
+        with forecasting.use_model(series_id, timer) as (model, model_version):
+            # Look up predictions for every day in the range (session memo first,
+            # then the precomputed table, live model otherwise)
+            date_range_forecast, memo_hit = session_memo(
+                ('date_range', series_id, model_version, start_date, end_date),
+                lambda: forecasting.forecast_dates(
+                    model, model_version, pd.date_range(start_date, end_date, freq='D'), timer=timer,
+                    series_id=series_id))
 
-    # Load the trained Prophet model
-    model = joblib.load('prophet.pkl')
+    # Display predictions for the selected date range
+    with timer.stage('render'):
+        if not date_range_forecast.empty:
+            st.write(f"## Predictions from {start_date.date()} to {end_date.date()}")
 
-    # Convert start_date and end_date to datetime and set the time to 04:00:00
-    start_date = pd.to_datetime(start_date).replace(hour=4, minute=0, second=0)
-    end_date = pd.to_datetime(end_date).replace(hour=4, minute=0, second=0)
+            # Long ranges are paged on the server so each rerun sends a bounded payload
+            n_pages = -(-len(date_range_forecast) // RANGE_PAGE_SIZE)
+            page_number = 1
+            if n_pages > 1:
+                page_number = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1)
+            page_forecast = date_range_forecast.iloc[(page_number - 1) * RANGE_PAGE_SIZE:page_number * RANGE_PAGE_SIZE]
 
-    # Define future dates
-    last_date_in_data = model.history['ds'].max()
-    future_periods = (end_date - last_date_in_data).days + 1
+            # One band chart and one table, both built from whole columns
+            st.altair_chart(forecast_band_chart(page_forecast), use_container_width=True)
+            st.dataframe(pd.DataFrame({
+                'Date': page_forecast['ds'].dt.date.values,
+                'Predicted closing price': page_forecast['yhat'].round(2).values,
+                'Lower bound': page_forecast['yhat_lower'].round(2).values,
+                'Upper bound': page_forecast['yhat_upper'].round(2).values,
+            }), use_container_width=True)
 
-    # Create future dataframe
-    future = model.make_future_dataframe(periods=future_periods, freq='D')
+            # Provide an option to download the predictions as a CSV file
+            csv = date_range_forecast.to_csv(index=False)
+            st.download_button(
+                label="Download Predictions as CSV",
+                data=csv,
+                file_name="predictions.csv",
+                mime="text/csv"
+            )
+        else:
+            st.write("No predictions available for the selected date range.")
 
-    # Make predictions
-    forecast = model.predict(future)
+    timer.log(series=series_id, model_version=model_version, dates=len(date_range_forecast),
+              memo_hit=memo_hit)
+    warmup_notice()
+    timings_panel(timer)
 
-    # Filter predictions by date range
-    date_range_forecast = forecast[(forecast['ds'] >= start_date) & (forecast['ds'] <= end_date)]
+def forecast_band_chart(forecast):
+    import altair as alt
 
-    # Display predictions for the selected date range
-    if not date_range_forecast.empty:
-        st.write(f"## Predictions from {start_date.date()} to {end_date.date()}")
-        for _, row in date_range_forecast.iterrows():
-            st.write(f"**Date:** {row['ds'].date()}")
-            st.write(f"**Predicted closing price:** ${row['yhat']:.2f}")
-            st.write(f"**Lower bound:** ${row['yhat_lower']:.2f}")
-            st.write(f"**Upper bound:** ${row['yhat_upper']:.2f}")
-            st.write("---")
-        
-        # Provide an option to download the predictions as a CSV file
-        csv = date_range_forecast.to_csv(index=False)
-        st.download_button(
-            label="Download Predictions as CSV",
-            data=csv,
-            file_name="predictions.csv",
-            mime="text/csv"
-        )
-    else:
-        st.write("No predictions available for the selected date range.")
+    # Predicted price line over its lower/upper band
+    base = alt.Chart(forecast).encode(x=alt.X('ds:T', title='Date'))
+    band = base.mark_area(opacity=0.3).encode(
+        y=alt.Y('yhat_lower:Q', title='Predicted closing price', scale=alt.Scale(zero=False)),
+        y2='yhat_upper:Q',
+    )
+    line = base.mark_line().encode(y='yhat:Q')
+    return band + line
+
+def session_memo(key, compute):
+    # Returns (value, served from the memo). Keys hold every input of the
+    # forecast plus the model version, so a newly published model misses.
+    if 'forecast_memo' not in st.session_state:
+        st.session_state.forecast_memo = {}
+        st.session_state.memo_reruns = 0
+    memo = st.session_state.forecast_memo
+    if key in memo:
+        st.session_state.memo_reruns += 1
+        return memo[key], True
+
+    memo[key] = compute()
+    while len(memo) > SESSION_MEMO_SIZE:
+        del memo[next(iter(memo))]
+    return memo[key], False
+
+def warmup_notice():
+    # Forecasts are answered live either way; this only says whether the caches are warm yet
+    state = warmup.status()['state']
+    if state == 'running':
+        st.sidebar.caption("Warming up forecasts in the background...")
+    elif state == 'ready':
+        st.sidebar.caption("Forecasts are warmed up.")
+
+def timings_panel(timer):
+    import pandas as pd
+    import forecasting
+
+    # Optional debug panel with the per-stage timings of this rerun
+    if st.sidebar.checkbox("Show timings", value=False):
+        st.sidebar.write("### Request timings")
+        st.sidebar.table(pd.DataFrame({
+            'stage': list(timer.stages) + ['total'],
+            'ms': list(timer.as_millis().values()) + [round(timer.total * 1000, 3)],
+        }))
+        session = {'reruns served from memo': st.session_state.get('memo_reruns', 0),
+                   'memo entries': len(st.session_state.get('forecast_memo', {}))}
+        for title, stats in [("Session memo", session),
+                             ("Model cache", forecasting.model_registry_stats()),
+                             ("Forecast cache (disk)", forecasting.forecast_cache_stats())]:
+            st.sidebar.write(f"### {title}")
+            st.sidebar.table(pd.DataFrame({'value': list(stats.values())}, index=list(stats)))
 
 def upload_data_page():
     st.title('Upload Your Dataset for Custom Predictions')
     uploaded_file = st.file_uploader("Choose a CSV file", type="csv")
     
     if uploaded_file is not None:
+        import pandas as pd
         data = pd.read_csv(uploaded_file)
         st.write("### Uploaded Dataset")
         st.write(data)
@@ -0,0 +1,192 @@
+# Batch forecasts from a JSONL file of requests, one per line:
+#
+#   {"id": "a", "date": "2024-12-12"}
+#   {"id": "b", "start": "2024-12-01", "end": "2024-12-31"}
+#
+# The file is read twice. The first pass folds every requested day into one
+# merged set of day intervals (memory grows with the distinct days, not with
+# the number of lines); the union is forecast in one vectorized call; the
+# second pass streams one JSONL response per request, in input order.
+#
+#   python batch_forecast.py forecast_requests.jsonl --output forecasts.jsonl
+
+import argparse
+import functools
+import json
+import logging
+import re
+import sys
+
+import numpy as np
+
+import forecasting
+from prophet_engine import check_days
+
+logger = logging.getLogger(__name__)
+
+# Pending single days are folded into the merged intervals once this many pile up
+COMPACT_EVERY = 100000
+
+# Largest number of days a single request may ask for
+MAX_DATES_PER_REQUEST = 20000
+
+_DAY = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}')
+
+
+# The same few thousand date strings repeat across millions of lines
+@functools.lru_cache(maxsize=1 << 16)
+def _parse_day(text):
+    # Only full dates: numpy would also read '2024' as 2024-01-01 and 'nat' as
+    # NaT, which has no row in the forecast
+    if not _DAY.fullmatch(text):
+        raise ValueError(f"{text!r} is not a YYYY-MM-DD date")
+    # The engine's range: later days would be forecast as other dates
+    return check_days(np.datetime64(text, 'D'))[()]
+
+
+def parse_day(value):
+    if not isinstance(value, str):
+        raise ValueError(f"{value!r} is not a YYYY-MM-DD date")
+    return _parse_day(value)
+
+
+def parse_request(line):
+    # Returns (request dict, first day, last day)
+    request = json.loads(line)
+    if not isinstance(request, dict):
+        raise ValueError("request must be a JSON object")
+    if 'date' in request:
+        day = parse_day(request['date'])
+        return request, day, day
+    if 'start' in request and 'end' in request:
+        start, end = parse_day(request['start']), parse_day(request['end'])
+        if end < start:
+            raise ValueError("end must not be before start")
+        if (end - start).astype(np.int64) + 1 > MAX_DATES_PER_REQUEST:
+            raise ValueError(f"ranges are limited to {MAX_DATES_PER_REQUEST} days")
+        return request, start, end
+    raise ValueError("request needs either 'date' or 'start' and 'end'")
+
+
+class DayUnion:
+    # Union of day intervals, kept as a sorted list of disjoint, non-adjacent
+    # [start, end] pairs (int64 day numbers)
+
+    def __init__(self):
+        self.intervals = np.empty((0, 2), dtype=np.int64)
+        self._pending = []
+
+    def add(self, start, end):
+        self._pending.append((start, end))
+        if len(self._pending) >= COMPACT_EVERY:
+            self.compact()
+
+    def compact(self):
+        if not self._pending:
+            return
+        intervals = np.concatenate([self.intervals, np.array(self._pending, dtype=np.int64)])
+        self._pending = []
+        intervals = intervals[np.argsort(intervals[:, 0], kind='stable')]
+
+        # A new block starts wherever an interval begins after everything before it ended
+        running_end = np.maximum.accumulate(intervals[:, 1])
+        starts = np.concatenate([[True], intervals[1:, 0] > running_end[:-1] + 1])
+        block = np.cumsum(starts) - 1
+        merged_end = np.full(block[-1] + 1, np.iinfo(np.int64).min)
+        np.maximum.at(merged_end, block, intervals[:, 1])
+        self.intervals = np.column_stack([intervals[starts, 0], merged_end])
+
+    def days(self):
+        self.compact()
+        if len(self.intervals) == 0:
+            return np.empty(0, dtype='datetime64[D]')
+        lengths = self.intervals[:, 1] - self.intervals[:, 0] + 1
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return (np.repeat(self.intervals[:, 0], lengths) + offsets).astype('datetime64[D]')
+
+
+def collect_days(path):
+    union = DayUnion()
+    n_requests = n_errors = 0
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            n_requests += 1
+            try:
+                _, start, end = parse_request(line)
+            except ValueError:
+                n_errors += 1
+                continue
+            union.add(start.astype(np.int64), end.astype(np.int64))
+    return union.days(), n_requests, n_errors
+
+
+def render_days(days, forecast):
+    # Each distinct day is serialized once; responses splice these strings
+    return [
+        json.dumps({'date': str(day), 'yhat': yhat, 'yhat_lower': lower, 'yhat_upper': upper})
+        for day, yhat, lower, upper in zip(
+            days, forecast['yhat'].tolist(), forecast['yhat_lower'].tolist(), forecast['yhat_upper'].tolist())
+    ]
+
+
+def splice(fields, members):
+    # Append pre-rendered JSON members to a small JSON object
+    head = json.dumps(fields)
+    return '{' + members + '}' if head == '{}' else head[:-1] + ', ' + members + '}'
+
+
+def stream_responses(path, days, rendered, out):
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                request, start, end = parse_request(line)
+            except ValueError as e:
+                out.write(json.dumps({'line': line_number, 'error': str(e)}) + '\n')
+                continue
+
+            lo = np.searchsorted(days, start)
+            if 'date' in request:
+                # The rendered day already carries the date
+                fields = {'id': request['id']} if 'id' in request else {}
+                response = splice(fields, rendered[lo][1:-1])
+            else:
+                fields = {key: request[key] for key in ('id', 'start', 'end') if key in request}
+                hi = np.searchsorted(days, end, side='right')
+                response = splice(fields, '"forecasts": [' + ', '.join(rendered[lo:hi]) + ']')
+            out.write(response + '\n')
+
+
+def run_batch(path, out):
+    timer = forecasting.StageTimer('batch')
+    with timer.stage('frame_build'):
+        days, n_requests, n_errors = collect_days(path)
+
+    with forecasting.use_model(timer=timer) as (model, model_version):
+        forecast = forecasting.forecast_dates(model, model_version, days, timer=timer)
+
+    with timer.stage('render'):
+        stream_responses(path, days, render_days(days, forecast), out)
+
+    timer.log(model_version=model_version, requests=n_requests, errors=n_errors, dates=len(days))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Forecast every request in a JSONL file.")
+    parser.add_argument('requests', help="JSONL file with one {'date': ...} or {'start': ..., 'end': ...} per line")
+    parser.add_argument('--output', help="Write responses here instead of stdout")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as out:
+            run_batch(args.requests, out)
+    else:
+        run_batch(args.requests, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
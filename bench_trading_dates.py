@@ -0,0 +1,60 @@
+# Speed of trading_dates.parse against pandas on the CSV's Date column.
+#
+# The EBAY dates are repeated to --rows values. Each parser has to produce
+# the trading dates: pandas parses to UTC, shifts back by each row's offset
+# and drops the time, which is what the offsets are needed for.
+#
+#   python bench_trading_dates.py
+#   python bench_trading_dates.py --rows 5000000 --repeat 5
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import trading_dates
+
+
+def pandas_trading_dates(values):
+    # The offsets are lost once parsed to UTC, so they are parsed separately
+    stamps = pd.to_datetime(values, utc=True)
+    offsets = values.str[19:]
+    minutes = offsets.str[1:3].astype(int) * 60 + offsets.str[4:6].astype(int)
+    minutes = np.where(offsets.str[0] == '-', -minutes, minutes)
+    local = stamps.dt.tz_localize(None) + pd.to_timedelta(minutes, unit='m')
+    return local.to_numpy().astype('datetime64[D]'), minutes.astype(np.int16)
+
+
+def best_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return 1000 * min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare trading_dates.parse with pd.to_datetime.")
+    parser.add_argument('--csv', default='ebay_historical_data.csv')
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    dates = pd.read_csv(args.csv, usecols=['Date'])['Date']
+    values = pd.Series(np.resize(dates.to_numpy(), args.rows))
+
+    days, offsets = trading_dates.parse(values)
+    expected_days, expected_offsets = pandas_trading_dates(values)
+    if not (np.array_equal(days, expected_days) and np.array_equal(offsets, expected_offsets)):
+        raise SystemExit("parsers disagree")
+
+    print(f"{args.rows:,} dates")
+    print(f"{'pd.to_datetime(utc=True) only':<32} {best_ms(lambda: pd.to_datetime(values, utc=True), args.repeat):10.0f} ms")
+    print(f"{'pandas, trading dates + offsets':<32} {best_ms(lambda: pandas_trading_dates(values), args.repeat):10.0f} ms")
+    print(f"{'trading_dates.parse':<32} {best_ms(lambda: trading_dates.parse(values), args.repeat):10.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Latency and accuracy of each uncertainty method on the EBAY model.
+#
+# Accuracy is the mean absolute difference of yhat_lower/yhat_upper from a
+# reference run with many more samples (and another seed), in dollars.
+#
+#   python bench_uncertainty.py
+#   python bench_uncertainty.py --model prophet_engine.npz --repeat 5
+
+import argparse
+import time
+
+import numpy as np
+
+from prophet_engine import load_artifact
+
+METHODS = [
+    ('samples', {'method': 'samples'}),
+    ('samples:200', {'method': 'samples', 'uncertainty_samples': 200}),
+    ('samples:50', {'method': 'samples', 'uncertainty_samples': 50}),
+    ('analytic', {'method': 'analytic'}),
+    ('cached', {'method': 'cached'}),
+]
+
+
+def scenarios(engine):
+    # The app's default requests, a year ahead, and three years ahead
+    next_day = engine.last_day + 1
+    return [
+        ('2024-12-12', np.array(['2024-12-12'], dtype='datetime64[D]')),
+        ('2024-12 range', np.arange(np.datetime64('2024-12-01'), np.datetime64('2025-01-01'))),
+        ('next 365 days', next_day + np.arange(365)),
+        ('next 1095 days', next_day + np.arange(1095)),
+    ]
+
+
+def median_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return 1000 * float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare uncertainty methods on a model artifact.")
+    parser.add_argument('--model', default='prophet_engine.npz')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--reference-samples', type=int, default=20000)
+    args = parser.parse_args()
+
+    engine = load_artifact(args.model)
+    print(f"{'scenario':<16} {'method':<12} {'median ms':>10} {'mean |error| $':>15} {'max |error| $':>14}")
+    for name, days in scenarios(engine):
+        reference = engine.predict_days(days, uncertainty_samples=args.reference_samples, seed=12345)
+        for label, options in METHODS:
+            forecast = engine.predict_days(days, **options)
+            errors = np.abs(np.concatenate([forecast['yhat_lower'] - reference['yhat_lower'],
+                                            forecast['yhat_upper'] - reference['yhat_upper']]))
+            ms = median_ms(lambda: engine.predict_days(days, **options), args.repeat)
+            print(f"{name:<16} {label:<12} {ms:10.2f} {errors.mean():15.3f} {errors.max():14.3f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# Forecasts that had to be computed live, kept on disk across restarts.
+#
+# Entries live in <root>/<series>/<model version>/<key>.npz with one array per
+# column. The key hashes the requested days and the uncertainty settings, and
+# the model version is the model's content hash, so a new model never sees an
+# entry computed by an old one; directories of replaced versions are removed
+# when a new version first writes. Once the cache grows past `max_bytes` the
+# least recently used entries go first (a hit refreshes an entry's mtime).
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ('yhat', 'yhat_lower', 'yhat_upper')
+
+# Eviction trims the cache to this fraction of `max_bytes`, so it does not run on every write
+EVICT_TO = 0.9
+
+
+def entry_key(days, settings):
+    digest = hashlib.sha256(np.asarray(days, dtype='datetime64[D]').astype('<i8').tobytes())
+    digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()[:32]
+
+
+class DiskForecastCache:
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._nbytes = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path(self, series_id, model_version, days, settings):
+        return os.path.join(self.root, series_id, model_version, entry_key(days, settings) + '.npz')
+
+    def get(self, series_id, model_version, days, settings):
+        # Returns the cached columns for exactly these days, or None
+        path = self.path(series_id, model_version, days, settings)
+        try:
+            with np.load(path) as data:
+                columns = [data[name] for name in COLUMNS]
+            os.utime(path)
+        except FileNotFoundError:
+            columns = None
+        except (OSError, ValueError, KeyError):
+            # Unreadable entry (e.g. removed mid-read): treat as a miss
+            logger.warning("Ignoring forecast cache entry %s", path, exc_info=True)
+            columns = None
+
+        with self._lock:
+            if columns is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return columns
+
+    def put(self, series_id, model_version, days, settings, columns):
+        self._invalidate(series_id, model_version)
+        path = self.path(series_id, model_version, days, settings)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **dict(zip(COLUMNS, columns)))
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except OSError:
+            logger.warning("Could not write forecast cache entry %s", path, exc_info=True)
+            return
+
+        with self._lock:
+            if self._nbytes is None:
+                self._nbytes = self._scan_bytes()
+            else:
+                self._nbytes += size
+            if self._nbytes > self.max_bytes:
+                self._evict()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'bytes': self._nbytes, 'budget_bytes': self.max_bytes}
+
+    def _invalidate(self, series_id, model_version):
+        # The first write of a version this process has not written before
+        # removes the entries of every other version of the series; going back
+        # to a known version (requests draining after a swap) removes nothing
+        with self._lock:
+            seen = self._versions.setdefault(series_id, set())
+            if model_version in seen:
+                return
+            seen.add(model_version)
+            self._nbytes = None
+        series_dir = os.path.join(self.root, series_id)
+        try:
+            names = os.listdir(series_dir)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name != model_version:
+                shutil.rmtree(os.path.join(series_dir, name), ignore_errors=True)
+
+    def _entries(self):
+        entries = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, os.path.join(directory, name)))
+        return entries
+
+    def _scan_bytes(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        # Other processes share the directory, so the listing is the truth
+        entries = sorted(self._entries())
+        self._nbytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._nbytes <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._nbytes -= size
+            self.evictions += 1
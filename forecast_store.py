@@ -0,0 +1,108 @@
+# Memory-mapped forecast snapshots shared by every app process on a host.
+#
+# A snapshot file is a fixed 64-byte header, an int64 column of day numbers
+# (days since 1970-01-01, sorted) and one float64 column per forecast field.
+# Writers build a complete file under a temporary name and rename it over the
+# old one, so readers only ever see whole snapshots. Readers map the file
+# read-only: the pages live once in the OS page cache no matter how many
+# processes read them, and an old mapping stays valid until it is dropped.
+
+import os
+import threading
+
+import numpy as np
+
+MAGIC = b'FCSTORE1'
+FORMAT_VERSION = 1
+COLUMNS = ('yhat', 'yhat_lower', 'yhat_upper')
+
+HEADER = np.dtype([
+    ('magic', 'S8'),
+    ('format_version', '<i8'),
+    ('model_version', 'S16'),
+    ('rows', '<i8'),
+    ('columns', '<i8'),
+])
+HEADER_BYTES = 64
+
+
+def write_snapshot(path, model_version, days, values):
+    # `days` is a sorted datetime64[D] array, `values` a (len(COLUMNS), rows)
+    # float array; the snapshot replaces `path` atomically
+    days = np.asarray(days, dtype='datetime64[D]').astype('<i8')
+    values = np.asarray(values, dtype='<f8').reshape(len(COLUMNS), len(days))
+
+    header = np.zeros(1, dtype=HEADER)
+    header['magic'] = MAGIC
+    header['format_version'] = FORMAT_VERSION
+    header['model_version'] = model_version.encode('ascii')
+    header['rows'] = len(days)
+    header['columns'] = len(COLUMNS)
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header.tobytes().ljust(HEADER_BYTES, b'\0'))
+        f.write(days.tobytes())
+        f.write(values.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ForecastSnapshot:
+    # Read-only, zero-copy view of one snapshot file
+
+    def __init__(self, path):
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+        header = data[:HEADER.itemsize].view(HEADER)[0]
+        if header['magic'] != MAGIC or header['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} forecast snapshot")
+
+        rows = int(header['rows'])
+        self.model_version = header['model_version'].decode('ascii')
+        self.day_numbers = data[HEADER_BYTES:HEADER_BYTES + 8 * rows].view('<i8')
+        self.values = data[HEADER_BYTES + 8 * rows:HEADER_BYTES + 8 * rows * (1 + len(COLUMNS))].view('<f8')
+        self.values = self.values.reshape(len(COLUMNS), rows)
+
+    def __len__(self):
+        return len(self.day_numbers)
+
+    @property
+    def start_day(self):
+        return np.datetime64(int(self.day_numbers[0]), 'D')
+
+    @property
+    def end_day(self):
+        return np.datetime64(int(self.day_numbers[-1]), 'D')
+
+    def lookup(self, days):
+        # Returns (mask of days found, len(COLUMNS) x hits values)
+        wanted = np.asarray(days, dtype='datetime64[D]').astype(np.int64)
+        idx = np.searchsorted(self.day_numbers, wanted)
+        hit = idx < len(self)
+        hit[hit] = self.day_numbers[idx[hit]] == wanted[hit]
+        return hit, self.values[:, idx[hit]]
+
+
+class ForecastStore:
+    # Hands out the current snapshot at `path`, re-mapping it whenever a
+    # writer has renamed a new file into place
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._identity = None
+        self._snapshot = None
+
+    def snapshot(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if identity != self._identity:
+                self._snapshot = ForecastSnapshot(self.path) if stat.st_size > HEADER_BYTES else None
+                self._identity = identity
+            return self._snapshot
@@ -0,0 +1,679 @@
+# Shared forecasting helpers for the Streamlit app.
+#
+# Streamlit re-executes app.py from the top on every interaction, so anything
+# that must survive between reruns (and be shared by every session in the
+# process) lives in this imported module instead.
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+
+import numpy as np
+import pandas as pd
+
+from forecast_cache import DiskForecastCache
+from forecast_store import ForecastStore, write_snapshot
+from prophet_engine import UNCERTAINTY_METHODS, ProphetEngine, load_artifact
+
+logger = logging.getLogger(__name__)
+timing_logger = logging.getLogger(__name__ + '.timing')
+
+# Compact engine artifact written by the notebook; the pickled Prophet model
+# is still accepted wherever a model path is expected
+MODEL_PATH = 'prophet_engine.npz'
+FORECAST_TABLE_PATH = 'forecast_table.bin'
+
+# The EBAY model and table live at the paths above; every other series keeps
+# the same two files in its own directory, e.g. models/AMZN/prophet_engine.npz
+DEFAULT_SERIES = 'EBAY'
+MODELS_DIR = 'models'
+
+# Published releases of a series live in models/<series>/releases/<version>/;
+# the CURRENT file in the series directory names the one being served
+RELEASES_DIR = 'releases'
+CURRENT_POINTER = 'CURRENT'
+
+# Bytes of model data kept in memory across all series
+MODEL_MEMORY_BUDGET = int(os.environ.get('FORECAST_MODEL_MEMORY_BUDGET', 256 * 1024 * 1024))
+
+# Number of days after the last training date covered by the forecast table
+FORECAST_HORIZON_DAYS = 365
+
+# Dates more than this many days past the cached horizon are predicted
+# directly instead of filling the gap up to them
+MAX_HORIZON_GAP_DAYS = 366
+
+# The cached horizon is never extended more than this many days past
+# FORECAST_HORIZON_DAYS; later dates are predicted directly
+MAX_HORIZON_EXTENSION_DAYS = 730
+
+# Live forecasts (history dates and dates far past the horizon) are kept on
+# disk here, up to FORECAST_CACHE_MAX_BYTES
+FORECAST_CACHE_DIR = 'forecast_cache'
+FORECAST_CACHE_MAX_BYTES = int(os.environ.get('FORECAST_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+# How intervals are computed for live forecasts made while serving:
+# 'samples', 'samples:<count>', 'analytic' or 'cached'. See prophet_engine.py
+# for the tradeoffs. The shared forecast table, horizon extensions included,
+# is shared by processes whatever their setting, so it always samples with
+# the model's full count.
+FORECAST_UNCERTAINTY = os.environ.get('FORECAST_UNCERTAINTY', 'samples')
+
+# Bytes one live uncertainty simulation may hold at once; longer requests are
+# simulated a chunk of days at a time, with the same result
+SIMULATION_MEMORY_BUDGET = int(os.environ.get('FORECAST_SIMULATION_MEMORY_BUDGET', 64 * 1024 * 1024))
+
+# Seconds between checks of the model file for changes
+MODEL_CHECK_INTERVAL = 2.0
+
+
+class StageTimer:
+    # Wall-clock time spent in each named stage of one request
+
+    def __init__(self, request):
+        self.request = request
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    @property
+    def total(self):
+        return sum(self.stages.values())
+
+    def as_millis(self):
+        return {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()}
+
+    def log(self, **fields):
+        # One JSON line per request so the timings can be aggregated downstream
+        record = {'event': 'timing', 'request': self.request, 'stages_ms': self.as_millis(),
+                  'total_ms': round(self.total * 1000, 3)}
+        record.update(fields)
+        timing_logger.info(json.dumps(record, default=str))
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_version(path):
+    # Short content hash used to tag everything derived from a model file
+    return file_sha256(path)[:12]
+
+
+def load_engine(path):
+    if path.endswith('.npz'):
+        engine = load_artifact(path)
+    else:
+        # Legacy pickle: needs joblib and prophet, keep only the engine built from it
+        import joblib
+        engine = ProphetEngine.from_model(joblib.load(path))
+    engine.memory_budget = SIMULATION_MEMORY_BUDGET
+    return engine
+
+
+class SingleFlight:
+    # Collapses concurrent calls with the same key into one computation: the
+    # first caller runs it, later callers wait for it and share the result.
+    # Each key has its own in-flight call, so a slow key never blocks others.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class _Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_SERIES_ID = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]*$')
+
+
+def series_dir(series_id):
+    if not _SERIES_ID.match(series_id):
+        raise ValueError(f"Invalid series id {series_id!r}")
+    return os.path.join(MODELS_DIR, series_id)
+
+
+def series_paths(series_id):
+    # (model path, forecast table path) of a series' unpublished files, used
+    # until the series has a published release
+    if series_id == DEFAULT_SERIES:
+        return MODEL_PATH, FORECAST_TABLE_PATH
+    directory = series_dir(series_id)
+    return os.path.join(directory, MODEL_PATH), os.path.join(directory, FORECAST_TABLE_PATH)
+
+
+def release_paths(series_id, version):
+    # (model path, forecast table path) of a published release; the model file
+    # of a release is never modified once the CURRENT pointer can name it
+    directory = os.path.join(series_dir(series_id), RELEASES_DIR, version)
+    return os.path.join(directory, MODEL_PATH), os.path.join(directory, FORECAST_TABLE_PATH)
+
+
+def current_release(series_id):
+    # Version named by the series' CURRENT pointer, or None before the first publish
+    try:
+        with open(os.path.join(series_dir(series_id), CURRENT_POINTER), encoding='utf-8') as f:
+            return json.load(f)['version']
+    except FileNotFoundError:
+        return None
+
+
+def table_path(series_id, version):
+    path = release_paths(series_id, version)[1]
+    return path if os.path.exists(path) else series_paths(series_id)[1]
+
+
+def list_series():
+    # The default series first, then every directory under MODELS_DIR with a model in it
+    try:
+        names = sorted(os.listdir(MODELS_DIR))
+    except OSError:
+        names = []
+    return [DEFAULT_SERIES] + [
+        name for name in names
+        if name != DEFAULT_SERIES and _SERIES_ID.match(name)
+        and any(os.path.exists(os.path.join(MODELS_DIR, name, f)) for f in (CURRENT_POINTER, MODEL_PATH))
+    ]
+
+
+class _SeriesFile:
+    # What the registry last saw of one series' model: `current` is the
+    # (version, path) pair being served, swapped as a whole
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = (None, None)
+        self.stat = None
+        self.checked_at = 0.0
+
+
+class ModelRegistry:
+    # Models keyed by (series id, version), loaded on first use and kept in an
+    # LRU bounded by `memory_budget` bytes. Each series is re-checked at most
+    # every `check_interval` seconds: a published series follows its CURRENT
+    # pointer; otherwise the model file is re-stat'ed and, when its mtime or
+    # size changes, the content hash decides whether there is a new version.
+    # Models leased by in-flight requests are never evicted.
+
+    def __init__(self, memory_budget=MODEL_MEMORY_BUDGET, check_interval=MODEL_CHECK_INTERVAL,
+                 load=load_engine):
+        self.memory_budget = memory_budget
+        self.check_interval = check_interval
+        self.load = load
+        self._lock = threading.Lock()
+        self._models = OrderedDict()
+        self._leases = {}
+        self._files = {}
+        self._loads = SingleFlight()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, series_id=DEFAULT_SERIES):
+        # Returns (engine, version) of the series' current model
+        file = self._file(series_id)
+        version, path = file.current
+        if version is None or time.monotonic() - file.checked_at >= self.check_interval:
+            # While another thread checks the file, keep serving the known version
+            if file.lock.acquire(blocking=version is None):
+                try:
+                    loaded = self._check(series_id, file)
+                finally:
+                    file.lock.release()
+                version, path = file.current
+                if loaded is not None:
+                    return loaded, version
+
+        key = (series_id, version)
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return entry[0], version
+        return self._loads.do(key, self._load, key, path), version
+
+    @contextmanager
+    def lease(self, series_id=DEFAULT_SERIES):
+        # Pins the series' current model for the duration of one request, so
+        # a version that was just replaced stays loaded until it drains
+        model, version = self.get(series_id)
+        key = (series_id, version)
+        with self._lock:
+            self._leases[key] = self._leases.get(key, 0) + 1
+        try:
+            yield model, version
+        finally:
+            with self._lock:
+                self._leases[key] -= 1
+                if not self._leases[key]:
+                    del self._leases[key]
+                self._evict()
+
+    def stats(self):
+        with self._lock:
+            return {'models': len(self._models), 'bytes': self.nbytes, 'budget_bytes': self.memory_budget,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'leased': sum(self._leases.values())}
+
+    def _file(self, series_id):
+        with self._lock:
+            file = self._files.get(series_id)
+            if file is None:
+                file = self._files[series_id] = _SeriesFile()
+            return file
+
+    def _check(self, series_id, file):
+        # Returns the model if a new version was loaded
+        file.checked_at = time.monotonic()
+        old_version = file.current[0]
+        try:
+            found = self._find(series_id, file)
+        except OSError:
+            if old_version is None:
+                raise
+            logger.warning("No model found for series %s, keeping version %s", series_id, old_version)
+            return None
+        if found is None:
+            return None
+
+        new_version, path, stat_key = found
+        if new_version == old_version:
+            file.stat = stat_key
+            return None
+
+        try:
+            model = self._loads.do((series_id, new_version), self._load, (series_id, new_version), path)
+        except Exception:
+            if old_version is None:
+                raise
+            # Most likely a half-written file; keep serving the old model and retry later
+            logger.exception("Failed to load %s, keeping version %s", path, old_version)
+            return None
+        logger.info("Loaded model %s version %s", path, new_version)
+        file.current, file.stat = (new_version, path), stat_key
+        return model
+
+    def _find(self, series_id, file):
+        # (version, path, stat key) of the series' model, or None if the
+        # unpublished model file has not been touched since the last check
+        version = current_release(series_id)
+        if version is not None:
+            return version, release_paths(series_id, version)[0], None
+
+        path = series_paths(series_id)[0]
+        stat = os.stat(path)
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        if stat_key == file.stat:
+            return None
+        # The file was touched: only reload if its content actually changed
+        return file_version(path), path, stat_key
+
+    def _load(self, key, path):
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                return entry[0]
+            self.misses += 1
+
+        model = self.load(path)
+        with self._lock:
+            if key not in self._models:
+                self._models[key] = (model, model.nbytes)
+                self.nbytes += model.nbytes
+                self._evict(keep=key)
+        return model
+
+    def _evict(self, keep=None):
+        # Least recently used first, skipping leased models and `keep`
+        for key in list(self._models):
+            if self.nbytes <= self.memory_budget:
+                break
+            if key == keep or key in self._leases:
+                continue
+            _, evicted_bytes = self._models.pop(key)
+            self.nbytes -= evicted_bytes
+            self.evictions += 1
+
+
+_registry = ModelRegistry()
+
+
+@contextmanager
+def use_model(series_id=DEFAULT_SERIES, timer=None):
+    # Yields (engine, version) for a series, loading it at most once per process
+    # and keeping it loaded until the block exits; use it around everything one
+    # request does with the model
+    timer = timer or StageTimer('model')
+    with ExitStack() as stack:
+        with timer.stage('model_load'):
+            model, version = stack.enter_context(_registry.lease(series_id))
+        yield model, version
+
+
+def model_registry_stats():
+    return _registry.stats()
+
+
+def forecast_cache_stats():
+    return _disk_cache.stats()
+
+
+def to_days(dates):
+    # Normalize dates/strings/Timestamps to a datetime64[D] array of calendar days
+    return pd.to_datetime(pd.Series(dates)).dt.normalize().to_numpy(dtype='datetime64[D]')
+
+
+def forecast_frame(days, yhat, yhat_lower, yhat_upper):
+    return pd.DataFrame({
+        'ds': pd.to_datetime(days),
+        'yhat': yhat,
+        'yhat_lower': yhat_lower,
+        'yhat_upper': yhat_upper,
+    })
+
+
+def predict_dates(model, days):
+    # Live prediction for exactly the given calendar days, so the cost scales
+    # with the number of days rather than with the history plus the horizon
+    days = np.unique(np.asarray(days, dtype='datetime64[D]'))
+    if len(days) == 0:
+        return forecast_frame(days, [], [], [])
+
+    forecast = model.predict_days(days, **SERVING_UNCERTAINTY)
+    return forecast_frame(days, forecast['yhat'], forecast['yhat_lower'], forecast['yhat_upper'])
+
+
+def uncertainty_options(spec=FORECAST_UNCERTAINTY):
+    # predict() keyword arguments for an uncertainty setting like 'samples:200'
+    method, colon, samples = spec.partition(':')
+    if method not in UNCERTAINTY_METHODS:
+        raise ValueError(f"FORECAST_UNCERTAINTY: unknown uncertainty method {method!r}; "
+                         f"expected one of {UNCERTAINTY_METHODS}")
+    options = {'method': method}
+    if colon:
+        # No intervals at all would leave forecasts without yhat_lower/yhat_upper
+        if not samples.isdigit() or int(samples) <= 0:
+            raise ValueError(f"FORECAST_UNCERTAINTY: sample count in {spec!r} must be a positive integer")
+        options['uncertainty_samples'] = int(samples)
+    return options
+
+
+SERVING_UNCERTAINTY = uncertainty_options()
+
+
+def uncertainty_settings(model):
+    # Everything besides the model and the days that changes the intervals
+    return {'method': SERVING_UNCERTAINTY['method'],
+            'uncertainty_samples': SERVING_UNCERTAINTY.get('uncertainty_samples', model.uncertainty_samples),
+            'interval_width': model.interval_width, 'seed': 0}
+
+
+def build_forecast_table(model, horizon_days=FORECAST_HORIZON_DAYS, path=FORECAST_TABLE_PATH,
+                         model_path=MODEL_PATH):
+    # Precompute the next `horizon_days` daily forecasts after the last training
+    # date and publish them as the shared, memory-mapped forecast table
+    if not isinstance(model, ProphetEngine):
+        model = ProphetEngine.from_model(model)
+    days = model.last_day + np.arange(1, horizon_days + 1)
+    forecast = model.predict_days(days)
+    write_snapshot(path, file_version(model_path), days,
+                   (forecast['yhat'], forecast['yhat_lower'], forecast['yhat_upper']))
+    return path
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_forecast_table(model_version, path=FORECAST_TABLE_PATH):
+    # Returns the current forecast table snapshot for `model_version`, or None
+    # if there is no table on disk or it was built for a different model. Every
+    # process maps the same file, so the table is held once per host.
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = ForecastStore(path)
+    table = store.snapshot()
+    return table if table is not None and table.model_version == model_version else None
+
+
+class ForecastHorizon:
+    # Daily forecasts for consecutive days from `start_day` up to the furthest
+    # day computed so far. Extending appends in place (amortized by doubling
+    # the buffer); readers only ever see fully written rows.
+
+    def __init__(self, start_day, capacity=FORECAST_HORIZON_DAYS):
+        self.start_day = np.datetime64(start_day, 'D')
+        self.size = 0
+        self._values = np.empty((3, max(capacity, 1)))
+
+    @property
+    def end_day(self):
+        return self.start_day + self.size - 1
+
+    def rows(self):
+        return self._values[:, :self.size]
+
+    def append(self, yhat, yhat_lower, yhat_upper):
+        n = len(yhat)
+        values = self._values
+        if self.size + n > values.shape[1]:
+            values = np.empty((3, max(2 * values.shape[1], self.size + n)))
+            values[:, :self.size] = self._values[:, :self.size]
+        values[:, self.size:self.size + n] = (yhat, yhat_lower, yhat_upper)
+        self._values = values
+        self.size += n
+
+    def lookup(self, days):
+        # Returns (row mask of days inside the horizon, 3 x hits values)
+        size = self.size
+        values = self._values
+        idx = (np.asarray(days, dtype='datetime64[D]') - self.start_day).astype(np.int64)
+        hit = (idx >= 0) & (idx < size)
+        return hit, values[:, idx[hit]]
+
+
+class HorizonCache:
+    # Consecutive daily forecasts from the day after the training data. The
+    # shared forecast table covers the start of that range; a process-local
+    # ForecastHorizon picks up where the table ends. Moving the end of a
+    # request forward only predicts the new days, and the longer range is
+    # published back as a new table snapshot so every other process on the
+    # host reads it from the same mapped file instead of recomputing it.
+
+    def __init__(self, series_id=DEFAULT_SERIES, max_gap_days=MAX_HORIZON_GAP_DAYS,
+                 max_extension_days=MAX_HORIZON_EXTENSION_DAYS, disk_cache=None):
+        self.series_id = series_id
+        self.max_gap_days = max_gap_days
+        self.max_extension_days = max_extension_days
+        self.disk_cache = disk_cache
+        self._lock = threading.Lock()
+        # Serializes extensions; lookups never take it
+        self._extend_lock = threading.Lock()
+        self._horizons = OrderedDict()
+
+    def table(self, model, model_version):
+        table = get_forecast_table(model_version, table_path(self.series_id, model_version))
+        return table if table is not None and table.start_day == model.last_day + 1 else None
+
+    def horizon(self, model, model_version, table):
+        with self._lock:
+            horizon = self._horizons.get(model_version)
+            if table is not None and (horizon is None or horizon.end_day <= table.end_day):
+                # Everything held locally is in the table by now: drop it
+                horizon = self._horizons[model_version] = ForecastHorizon(table.end_day + 1)
+            elif horizon is None:
+                horizon = self._horizons[model_version] = ForecastHorizon(model.last_day + 1)
+            # The current version and the one it replaced, while requests on it drain
+            self._horizons.move_to_end(model_version)
+            while len(self._horizons) > 2:
+                self._horizons.popitem(last=False)
+            return horizon
+
+    def last_day(self, model):
+        # Furthest day the horizon may be extended to
+        return model.last_day + FORECAST_HORIZON_DAYS + self.max_extension_days
+
+    def extend(self, model, model_version, end_day):
+        # Predicts every day from the end of the horizon through `end_day`
+        # (at most last_day), whatever the gap
+        end_day = min(end_day, self.last_day(model))
+        with self._extend_lock:
+            table = self.table(model, model_version)
+            horizon = self.horizon(model, model_version, table)
+            if end_day <= horizon.end_day:
+                return
+            new_days = np.arange(horizon.end_day + 1, end_day + 1)
+            # The full sampler, as build_forecast_table uses: the rows are
+            # published to processes with other uncertainty settings
+            forecast = model.predict_days(new_days)
+            horizon.append(forecast['yhat'], forecast['yhat_lower'], forecast['yhat_upper'])
+            self.publish(model, model_version, table, horizon)
+
+    def publish(self, model, model_version, table, horizon):
+        # The table always starts the day after the training data, so the new
+        # snapshot is the table rows before the local horizon plus the horizon
+        prefix = int((horizon.start_day - (model.last_day + 1)).astype(np.int64))
+        if prefix and (table is None or len(table) < prefix):
+            return
+        latest = self.table(model, model_version)
+        if latest is not None and latest.end_day >= horizon.end_day:
+            # Another process already published at least as much
+            return
+        values = horizon.rows()
+        if prefix:
+            values = np.concatenate([table.values[:, :prefix], values], axis=1)
+        try:
+            path = table_path(self.series_id, model_version)
+            write_snapshot(path, model_version, np.arange(model.last_day + 1, horizon.end_day + 1), values)
+        except OSError:
+            logger.exception("Could not publish the forecast table of %s version %s",
+                             self.series_id, model_version)
+
+    def forecast(self, model, model_version, days):
+        table = self.table(model, model_version)
+        horizon = self.horizon(model, model_version, table)
+        beyond = days[(days > horizon.end_day) & (days <= self.last_day(model))]
+        if len(beyond):
+            # Extend across the requested days that follow the horizon with no
+            # gap longer than max_gap_days; the days after a longer gap are
+            # predicted live
+            gaps = np.diff(np.concatenate([[horizon.end_day], beyond])).astype(np.int64)
+            far = np.flatnonzero(gaps > self.max_gap_days)
+            run = far[0] if len(far) else len(beyond)
+            if run:
+                self.extend(model, model_version, beyond[run - 1])
+                table = self.table(model, model_version)
+                horizon = self.horizon(model, model_version, table)
+
+        found = np.zeros(len(days), dtype=bool)
+        values = np.empty((3, len(days)))
+        for source in (table, horizon):
+            if source is None:
+                continue
+            rest = np.flatnonzero(~found)
+            hit, hit_values = source.lookup(days[rest])
+            values[:, rest[hit]] = hit_values
+            found[rest[hit]] = True
+
+        forecast = forecast_frame(days[found], *values[:, found])
+        if not found.all():
+            # History dates and dates far beyond the horizon
+            live = self.predict_live(model, model_version, days[~found])
+            forecast = pd.concat([forecast, live]).sort_values('ds', ignore_index=True)
+        return forecast
+
+    def predict_live(self, model, model_version, days):
+        if self.disk_cache is None:
+            return predict_dates(model, days)
+        settings = uncertainty_settings(model)
+        columns = self.disk_cache.get(self.series_id, model_version, days, settings)
+        if columns is not None:
+            return forecast_frame(days, *columns)
+        forecast = predict_dates(model, days)
+        self.disk_cache.put(self.series_id, model_version, days, settings,
+                            (forecast['yhat'].to_numpy(), forecast['yhat_lower'].to_numpy(),
+                             forecast['yhat_upper'].to_numpy()))
+        return forecast
+
+
+_disk_cache = DiskForecastCache(FORECAST_CACHE_DIR, FORECAST_CACHE_MAX_BYTES)
+_horizon_caches = {}
+_horizon_caches_lock = threading.Lock()
+_forecast_flights = SingleFlight()
+
+
+def horizon_cache(series_id=DEFAULT_SERIES):
+    with _horizon_caches_lock:
+        cache = _horizon_caches.get(series_id)
+        if cache is None:
+            cache = _horizon_caches[series_id] = HorizonCache(series_id, disk_cache=_disk_cache)
+        return cache
+
+
+def extend_horizon(model, model_version, end_day, series_id=DEFAULT_SERIES):
+    # Precompute the series' daily forecasts through `end_day`, or as far
+    # towards it as the horizon may go, even across a gap forecast() would
+    # answer live; the days are then served from the shared table
+    horizon_cache(series_id).extend(model, model_version, np.datetime64(end_day, 'D'))
+
+
+def forecast_dates(model, model_version, dates, timer=None, series_id=DEFAULT_SERIES):
+    # Serve the requested days from the series' shared forecast table and the
+    # cached horizon after it, and only run the model for the days both lack.
+    # Identical concurrent requests (same series, model version and days)
+    # share one computation.
+    timer = timer or StageTimer('forecast')
+    with timer.stage('frame_build'):
+        days = np.unique(to_days(dates))
+    with timer.stage('predict'):
+        key = (series_id, model_version, days.tobytes())
+        cache = horizon_cache(series_id)
+        return _forecast_flights.do(key, cache.forecast, model, model_version, days).copy()
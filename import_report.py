@@ -0,0 +1,102 @@
+# Import-time report for the app and the forecasting stack.
+#
+# Each module is imported in a fresh interpreter with `python -X importtime`,
+# so the numbers are cold-start costs. With --budget-ms the command exits
+# non-zero when a module's total import time goes over the budget.
+#
+# Modules that start the background warm-up (warmup.py) on import are
+# measured with it turned off, so its imports do not interleave with theirs.
+# The warm-up still competes with the first page for the CPU, so its cost is
+# measured separately and reported under the module; it is not counted
+# against the budget.
+#
+#   python import_report.py
+#   python import_report.py app forecasting --top 15 --budget-ms 1500
+
+import argparse
+import os
+import subprocess
+import sys
+
+DEFAULT_MODULES = ['app', 'forecasting', 'prophet_engine', 'api', 'batch_forecast']
+
+# Modules that start the warm-up thread when imported
+WARMUP_MODULES = ['app']
+
+
+def import_times(module):
+    # Returns [(package, depth, self_us, cumulative_us)] in the order the
+    # imports finished; depth 0 is the imported module itself
+    # Importing the app starts the warm-up thread, whose imports would
+    # interleave with the ones being measured
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, env=dict(os.environ, FORECAST_WARMUP='0'),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, package = line[len('import time:'):].split('|')
+        depth = (len(package) - len(package.lstrip()) - 1) // 2
+        rows.append((package.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def warmup_ms(module):
+    # Milliseconds from the end of the import until the warm-up it started is
+    # done (its own imports, the model load and the forecasts), and the state
+    # it ended in
+    code = (f"import time, warmup, {module}; started = time.perf_counter(); state = warmup.wait()['state']; "
+            f"print((time.perf_counter() - started) * 1000, state)")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            env=dict(os.environ, FORECAST_WARMUP='1'))
+    if result.returncode != 0:
+        raise RuntimeError(f"warm-up after import {module} failed:\n{result.stderr}")
+    ms, state = result.stdout.split()[-2:]
+    return float(ms), state
+
+
+def report(module, top):
+    rows = import_times(module)
+    # The module's own line closes the import tree
+    end = max(i for i, row in enumerate(rows) if row[0] == module and row[1] == 0)
+    start = max([i + 1 for i, row in enumerate(rows[:end]) if row[1] == 0] or [0])
+    total_us = rows[end][3]
+
+    print(f"import {module}: {total_us / 1000:.1f} ms total, {end - start + 1} modules loaded")
+    print(f"  {'cumulative ms':>13}  {'self ms':>8}  imported by {module}")
+    direct = [row for row in rows[start:end] if row[1] == 1]
+    for package, _, self_us, cumulative_us in sorted(direct, key=lambda row: -row[3])[:top]:
+        print(f"  {cumulative_us / 1000:13.1f}  {self_us / 1000:8.1f}  {package}")
+    if module in WARMUP_MODULES:
+        ms, state = warmup_ms(module)
+        print(f"  measured with FORECAST_WARMUP=0; the warm-up thread it starts runs {ms:.0f} ms more "
+              f"in the background ({state}), not counted above")
+    print()
+    return total_us / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report per-module import cost.")
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--top', type=int, default=10, help="packages to list per module")
+    parser.add_argument('--budget-ms', type=float, help="fail if any module takes longer to import")
+    args = parser.parse_args()
+
+    over_budget = []
+    for module in args.modules:
+        total_ms = report(module, args.top)
+        if args.budget_ms is not None and total_ms > args.budget_ms:
+            over_budget.append(f"{module} ({total_ms:.0f} ms)")
+
+    if over_budget:
+        print(f"Over the {args.budget_ms:.0f} ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
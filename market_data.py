@@ -0,0 +1,260 @@
+# Incremental refresh of the daily price history CSVs.
+#
+# Each ticker's history lives in <data dir>/<ticker>_historical_data.csv, in
+# the format yfinance's history().to_csv() writes. A refresh reads only the
+# last REVISION_ROWS rows of the file, fetches the bars from the oldest of
+# them onwards and compares the overlap: rows the source has revised since
+# (a late correction of the last bar, say) are cut off the end of the file
+# and rewritten, and the new bars are appended. The file is never read or
+# rewritten in full, so a daily refresh costs a few rows, not the whole
+# history. Only when the oldest overlapping row has changed too, which is what
+# a split or dividend adjustment of the whole history looks like, is the full
+# history downloaded again.
+#
+# Every change is also made to the ticker's partitions in price_store.py,
+# which is what the notebook and retraining read. Bars are run through
+# price_checks.py before anything is written: a full download as a whole, an
+# append together with the stored rows it follows. Bars that fail a check of
+# error severity are refused and the files left as they were; warnings are
+# logged.
+#
+# Fetchers are objects with fetch(ticker, start) returning a DataFrame indexed
+# by date, with start=None meaning the full history. YahooFetcher downloads
+# from Yahoo Finance; ReplayFetcher serves saved CSVs, for working offline.
+#
+#   python market_data.py EBAY AAPL
+#   python market_data.py EBAY --replay snapshots/2024-08-28
+
+import argparse
+import concurrent.futures
+import io
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import price_checks
+import price_store
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.environ.get('MARKET_DATA_DIR', '.')
+
+# Stored rows re-fetched on every refresh to catch revisions
+REVISION_ROWS = int(os.environ.get('MARKET_DATA_REVISION_ROWS', 5))
+
+# Tickers refreshed at once; fetching is mostly waiting on the network
+REFRESH_WORKERS = int(os.environ.get('MARKET_DATA_WORKERS', 4))
+
+# Relative difference below which a re-fetched value counts as unchanged
+REVISION_TOLERANCE = 1e-9
+
+
+def data_path(ticker, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f'{ticker.lower()}_historical_data.csv')
+
+
+def day_of(label):
+    # '2024-08-27 00:00:00-04:00' (or a Timestamp) -> '2024-08-27'
+    return str(label)[:10]
+
+
+class YahooFetcher:
+
+    def fetch(self, ticker, start=None):
+        import yfinance as yf
+
+        if start is None:
+            return yf.Ticker(ticker).history(period='max', interval='1d')
+        return yf.Ticker(ticker).history(start=start, interval='1d')
+
+
+class ReplayFetcher:
+    # Serves <directory>/<ticker>_historical_data.csv files, e.g. an older copy
+    # of the data directory, as if they were the source
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch(self, ticker, start=None):
+        frame = pd.read_csv(data_path(ticker, self.directory), index_col='Date', float_precision='round_trip')
+        if start is None:
+            return frame
+        days = np.array([day_of(label) for label in frame.index], dtype='datetime64[D]')
+        return frame[days >= np.datetime64(start, 'D')]
+
+
+def read_tail(path, n_rows, block_size=1 << 16):
+    # The header and the last n_rows lines of a file, read backwards from its
+    # end; returns (header, [(byte offset, line), ...])
+    with open(path, 'rb') as f:
+        header = f.readline()
+        body_start = f.tell()
+        end = f.seek(0, os.SEEK_END)
+        position, data = end, b''
+        while position > body_start and data.count(b'\n') <= n_rows:
+            position = max(body_start, position - block_size)
+            f.seek(position)
+            data = f.read(end - position)
+
+    lines = data.split(b'\n')
+    if position > body_start:
+        # The first piece is the end of an earlier line
+        position += len(lines[0]) + 1
+        lines = lines[1:]
+    rows = []
+    for line in lines:
+        if line.strip():
+            rows.append((position, line))
+        position += len(line) + 1
+    return header, rows[-n_rows:]
+
+
+def parse_rows(header, lines):
+    # round_trip: the values compare equal to the ones that were written
+    return pd.read_csv(io.BytesIO(header + b'\n'.join(lines) + b'\n'), index_col='Date',
+                       float_precision='round_trip')
+
+
+def rows_match(stored, fetched):
+    # Same values in every column both have (a fetched bar may be a float
+    # where the CSV kept an int, so compare numerically)
+    columns = [column for column in stored.columns if column in fetched.columns]
+    return bool(np.allclose(stored[columns].to_numpy(dtype=float), fetched[columns].to_numpy(dtype=float),
+                            rtol=REVISION_TOLERANCE, atol=0.0, equal_nan=True))
+
+
+def validate(ticker, table):
+    # Raises ValueError if the bars fail an error-level check
+    report = price_checks.check(price_store.to_frame(table))
+    for name, result in report['checks'].items():
+        if result['severity'] == 'warning' and result['count']:
+            logger.warning("%s: %d bars with %s (%s), first on %s", ticker, result['count'], name,
+                           result['description'], result['dates'][0])
+    try:
+        price_checks.require_clean(report)
+    except ValueError as exc:
+        raise ValueError(f"{ticker}: {exc}") from None
+
+
+def stored_end(ticker, csv_end, store_dir):
+    # Last day held by the CSV (`csv_end`, None if it has no bars) or the
+    # store, whichever is later; None if neither has bars
+    days = [csv_end] if csv_end else []
+    table = price_store.read_table(ticker, columns=[], store_dir=store_dir)
+    if len(table):
+        days.append(str(table.column('Date').to_numpy()[-1].astype('datetime64[D]')))
+    return max(days) if days else None
+
+
+def write_full(path, frame, ticker, store_dir, end=None):
+    # A full download replaces everything stored, so one that is empty or
+    # ends before `end` (a source failing halfway) is refused as losing bars
+    if not len(frame):
+        raise ValueError(f"{ticker}: the full download has no bars; nothing was changed")
+    if end is not None and day_of(frame.index[-1]) < end:
+        raise ValueError(f"{ticker}: the full download ends on {day_of(frame.index[-1])}, before the "
+                         f"stored history ({end}); nothing was changed")
+    table = price_store.from_frame(frame)
+    validate(ticker, table)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    frame.to_csv(tmp_path)
+    os.replace(tmp_path, path)
+    price_store.write_ticker(ticker, table, store_dir)
+
+
+def refresh(ticker, fetcher=None, data_dir=DATA_DIR, revision_rows=REVISION_ROWS, store_dir=price_store.STORE_DIR):
+    # Brings one ticker's CSV and price store up to date; returns what was done
+    fetcher = fetcher or YahooFetcher()
+    path = data_path(ticker, data_dir)
+    result = {'ticker': ticker, 'appended': 0, 'revised': 0, 'full': False}
+
+    try:
+        header, tail = read_tail(path, revision_rows)
+    except FileNotFoundError:
+        tail = []
+    if not tail:
+        frame = fetcher.fetch(ticker)
+        write_full(path, frame, ticker, store_dir, stored_end(ticker, None, store_dir))
+        result.update(appended=len(frame), full=True)
+        return result
+
+    stored = parse_rows(header, [line for _, line in tail])
+    stored_days = [day_of(label) for label in stored.index]
+    fetched = fetcher.fetch(ticker, start=stored_days[0])
+    fetched_days = np.array([day_of(label) for label in fetched.index], dtype='datetime64[D]')
+    by_day = dict(zip(fetched_days.astype(str), range(len(fetched))))
+
+    # The oldest overlapping row anchors the stored history to the source
+    first = by_day.get(stored_days[0])
+    if first is None or not rows_match(stored.iloc[[0]], fetched.iloc[[first]]):
+        logger.info("%s: history revised before %s, downloading it again", ticker, stored_days[0])
+        frame = fetcher.fetch(ticker)
+        write_full(path, frame, ticker, store_dir, stored_end(ticker, stored_days[-1], store_dir))
+        result.update(appended=len(frame), full=True)
+        return result
+
+    # Keep stored rows up to the first one the source no longer agrees with
+    keep = len(tail)
+    for i, day in enumerate(stored_days):
+        row = by_day.get(day)
+        if row is None or not rows_match(stored.iloc[[i]], fetched.iloc[[row]]):
+            keep = i
+            break
+    last_kept = np.datetime64(stored_days[keep - 1], 'D')
+    new_rows = fetched[fetched_days > last_kept]
+    new_table = price_store.from_frame(new_rows)
+    validate(ticker, pa.concat_tables([price_store.from_frame(stored.iloc[:keep]), new_table]))
+
+    # Truncating before appending is not atomic, but an interrupted refresh
+    # only loses trailing rows, which the next refresh fetches again
+    with open(path, 'r+b') as f:
+        if keep < len(tail):
+            f.truncate(tail[keep][0])
+        elif f.seek(-1, os.SEEK_END) and f.read(1) != b'\n':
+            f.write(b'\n')
+        f.seek(0, os.SEEK_END)
+        f.write(new_rows.to_csv(header=False).encode('utf-8'))
+    if not os.path.isdir(price_store.ticker_dir(ticker, store_dir)):
+        price_store.import_csv(path, ticker, store_dir)
+    else:
+        price_store.append(ticker, new_table, store_dir)
+
+    appended = int((fetched_days > np.datetime64(stored_days[-1], 'D')).sum())
+    result.update(appended=appended, revised=len(tail) - keep)
+    return result
+
+
+def refresh_all(tickers, fetcher=None, data_dir=DATA_DIR, workers=REFRESH_WORKERS, store_dir=price_store.STORE_DIR):
+    # Refreshes every ticker; one ticker failing does not stop the others
+    fetcher = fetcher or YahooFetcher()
+    results = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {ticker: pool.submit(refresh, ticker, fetcher, data_dir, store_dir=store_dir) for ticker in tickers}
+        for ticker, future in futures.items():
+            try:
+                results.append(future.result())
+            except Exception as exc:
+                logger.exception("Could not refresh %s", ticker)
+                results.append({'ticker': ticker, 'error': str(exc)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Append new daily bars to the price history CSVs.")
+    parser.add_argument('tickers', nargs='+')
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--store-dir', default=price_store.STORE_DIR)
+    parser.add_argument('--replay', metavar='DIR', help="serve bars from the CSVs in DIR instead of Yahoo Finance")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    fetcher = ReplayFetcher(args.replay) if args.replay else YahooFetcher()
+    for result in refresh_all(args.tickers, fetcher, args.data_dir, store_dir=args.store_dir):
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
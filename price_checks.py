@@ -0,0 +1,231 @@
+# Data-quality checks for daily price histories.
+#
+# check() runs every check over a whole OHLCV frame in one vectorized pass,
+# a cache-sized chunk of rows at a time (one or many tickers, rows grouped by
+# ticker and sorted by date), and
+# returns a report: per check its severity, how many rows failed and the
+# first few of them. Errors are data that must not reach a model; warnings
+# are worth a look but occur in real histories (market closures, crashes).
+# require_clean() raises on errors, which is how ingest (market_data.py) and
+# retraining (Main.ipynb) are gated.
+#
+#   report = price_checks.check(price_store.load('EBAY'))
+#   python price_checks.py EBAY AAPL
+
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+import trading_dates
+
+PRICE_COLUMNS = ('Open', 'High', 'Low', 'Close')
+
+# Weekdays a gap between two bars may skip without being reported: one
+# holiday. Longer closures (9/11, Hurricane Sandy) show up as warnings.
+MAX_MISSING_WEEKDAYS = 1
+
+# Relative slack for High/Low against Open/Close, for rounding in adjusted prices
+PRICE_TOLERANCE = 1e-6
+
+# A bar's log volume more than VOLUME_Z standard deviations from the previous
+# VOLUME_WINDOW bars of its ticker (given at least VOLUME_MIN_HISTORY of them)
+VOLUME_WINDOW = 63
+VOLUME_MIN_HISTORY = 20
+VOLUME_Z = 6.0
+
+# A close this many times above or below the previous one, as an unadjusted
+# split leaves behind
+SPLIT_RATIO = 1.8
+
+# Failing rows listed per check
+SAMPLE_ROWS = 10
+
+CHUNK_ROWS = 1 << 16
+
+# (name, severity, what failing means)
+CHECKS = [
+    ('unsorted_dates', 'error', "date earlier than the previous bar's"),
+    ('duplicate_dates', 'error', "same date as the previous bar"),
+    ('missing_values', 'error', "NaN price or volume"),
+    ('non_positive_prices', 'error', "open, high, low or close <= 0"),
+    ('ohlc_inconsistent', 'error', "high below open/close/low, or low above open/close"),
+    ('negative_volume', 'error', "volume < 0"),
+    ('missing_dates', 'warning', f"more than {MAX_MISSING_WEEKDAYS} weekday(s) missing before the bar"),
+    ('volume_outliers', 'warning', f"log volume beyond {VOLUME_Z:g} sd of the previous {VOLUME_WINDOW} bars"),
+    ('split_discontinuities', 'warning', f"close moved more than {SPLIT_RATIO:g}x from the previous bar"),
+]
+
+
+def _dates(frame):
+    values = frame['Date'] if 'Date' in frame else frame.index
+    values = np.asarray(values)
+    if values.dtype.kind in 'OSU':
+        # Timestamps as the CSV writes them
+        return trading_dates.parse(values)[0]
+    return values.astype('datetime64[D]')
+
+
+def _segments(frame):
+    # Ticker number of each row and the tickers, checking rows are grouped by
+    # ticker; a single-ticker frame is all zeros and None
+    if 'Ticker' not in frame:
+        return np.zeros(len(frame), dtype=np.int64), None
+    tickers = frame['Ticker']
+    if isinstance(tickers.dtype, pd.CategoricalDtype):
+        codes, names = tickers.cat.codes.to_numpy(), np.asarray(tickers.cat.categories)
+    else:
+        codes, names = pd.factorize(tickers)
+        names = np.asarray(names)
+    starts = np.flatnonzero(np.diff(codes)) + 1
+    if len(codes) and len(np.unique(codes[np.append(0, starts)])) != len(starts) + 1:
+        raise ValueError("rows must be grouped by ticker")
+    return codes, names
+
+
+def _volume_outliers(volume, starts):
+    # Bars whose log volume is more than VOLUME_Z standard deviations from
+    # the mean of the previous VOLUME_WINDOW bars of the same ticker (rows of
+    # a ticker start at `starts`), from running sums of log volume
+    n, window = len(volume), VOLUME_WINDOW
+    log_volume = np.log1p(np.maximum(volume, 0))
+    sums = np.zeros(n + 1)
+    np.cumsum(log_volume, out=sums[1:])
+    squares = np.zeros(n + 1)
+    np.cumsum(np.square(log_volume), out=squares[1:])
+
+    # Sums over the previous `window` rows, as if there were one ticker...
+    total, total_squares = sums[:-1].copy(), squares[:-1].copy()
+    total[window:] -= sums[:n - window]
+    total_squares[window:] -= squares[:n - window]
+    count = np.full(n, window, dtype=np.float64)
+    count[:window] = np.arange(min(window, n))
+
+    # ...then the first `window` rows of each ticker look back only to its first row
+    ends = np.append(starts[1:], n)
+    rows = (starts[:, None] + np.arange(window)).ravel()
+    first = np.repeat(starts, window)
+    keep = rows < np.repeat(ends, window)
+    rows, first = rows[keep], first[keep]
+    total[rows] = sums[rows] - sums[first]
+    total_squares[rows] = squares[rows] - squares[first]
+    count[rows] = rows - first
+
+    # |x - mean| > z * sd, multiplied through by count to avoid dividing;
+    # computed in place, the arrays above being done with
+    deviation = np.multiply(log_volume, count, out=log_volume)
+    deviation -= total
+    np.square(deviation, out=deviation)
+    spread = np.multiply(count, total_squares, out=total_squares)
+    spread -= np.square(total, out=total)
+    np.maximum(spread, 1e-12 * np.square(count), out=spread)
+    spread *= VOLUME_Z * VOLUME_Z
+    return (deviation > spread) & (count >= VOLUME_MIN_HISTORY)
+
+
+def _failures(days, codes, opens, highs, lows, closes, volume):
+    # Failing rows of each check for a run of consecutive rows (days as day
+    # numbers), as masks
+    n = len(days)
+
+    # Pairs of consecutive bars of the same ticker, flagged on the later bar
+    same = np.zeros(n, dtype=bool)
+    same[1:] = codes[1:] == codes[:-1]
+    step = np.zeros(n, dtype=np.int64)
+    step[1:] = days[1:] - days[:-1]
+
+    # Weekdays strictly between two bars, counted only where the step is long
+    # enough to skip more than MAX_MISSING_WEEKDAYS of them
+    gaps = np.flatnonzero(same & (step >= MAX_MISSING_WEEKDAYS + 2))
+    missing_dates = np.zeros(n, dtype=bool)
+    skipped = np.busday_count((days[gaps - 1] + 1).astype('datetime64[D]'), days[gaps].astype('datetime64[D]'))
+    missing_dates[gaps] = skipped > MAX_MISSING_WEEKDAYS
+
+    jumps = np.zeros(n, dtype=bool)
+    jumps[1:] = (closes[1:] > closes[:-1] * SPLIT_RATIO) | (closes[1:] * SPLIT_RATIO < closes[:-1])
+
+    upper = np.maximum(opens, closes)
+    lower = np.minimum(opens, closes)
+    return {
+        'unsorted_dates': same & (step < 0),
+        'duplicate_dates': same & (step == 0),
+        'missing_values': np.isnan(upper + highs + lows + volume),
+        'non_positive_prices': np.minimum(lower, np.minimum(highs, lows)) <= 0,
+        'ohlc_inconsistent': (highs < np.maximum(upper, lows) * (1 - PRICE_TOLERANCE))
+                             | (lows > lower * (1 + PRICE_TOLERANCE)),
+        'negative_volume': volume < 0,
+        'missing_dates': missing_dates,
+        'volume_outliers': _volume_outliers(volume, np.flatnonzero(~same)),
+        'split_discontinuities': same & jumps,
+    }
+
+
+def check(frame):
+    # Report on a frame with a Date column (or date index), the price columns
+    # and Volume, and optionally Ticker
+    n = len(frame)
+    days = _dates(frame)
+    day_numbers = days.view(np.int64)
+    codes, tickers = _segments(frame)
+    columns = [frame[name].to_numpy(dtype=np.float64) for name in PRICE_COLUMNS + ('Volume',)]
+
+    # Rows go CHUNK_ROWS at a time so the temporaries stay in cache; each
+    # chunk also sees the VOLUME_WINDOW rows before it, as context only
+    failed = {name: [] for name, _, _ in CHECKS}
+    for start in range(0, n, CHUNK_ROWS):
+        context = min(start, VOLUME_WINDOW)
+        rows = slice(start - context, start + CHUNK_ROWS)
+        masks = _failures(day_numbers[rows], codes[rows], *[column[rows] for column in columns])
+        for name, mask in masks.items():
+            # Almost every mask is all False
+            if np.count_nonzero(mask[context:]):
+                failed[name].append(np.flatnonzero(mask[context:]) + start)
+
+    report = {'rows': n, 'tickers': 1 if tickers is None else len(tickers), 'ok': True, 'checks': {}}
+    for name, severity, description in CHECKS:
+        rows = np.concatenate(failed[name]) if failed[name] else np.array([], dtype=np.int64)
+        sample = rows[:SAMPLE_ROWS]
+        result = {'severity': severity, 'description': description, 'count': len(rows),
+                  'rows': sample.tolist(), 'dates': days[sample].astype(str).tolist()}
+        if tickers is not None:
+            result['tickers'] = tickers[codes[sample]].tolist()
+        report['checks'][name] = result
+        if severity == 'error' and len(rows):
+            report['ok'] = False
+    return report
+
+
+def summary(report):
+    # One row per check, for display
+    return pd.DataFrame.from_dict(report['checks'], orient='index')[['severity', 'count', 'dates', 'description']]
+
+
+def require_clean(report):
+    if not report['ok']:
+        failed = [f"{name}: {result['count']} rows (first on {result['dates'][0]})"
+                  for name, result in report['checks'].items() if result['severity'] == 'error' and result['count']]
+        raise ValueError("price data failed validation: " + "; ".join(failed))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the stored price history of some tickers.")
+    parser.add_argument('tickers', nargs='+')
+    parser.add_argument('--json', action='store_true', help="print the full report as JSON")
+    parser.add_argument('--store-dir')
+    args = parser.parse_args()
+
+    import price_store
+    store_dir = args.store_dir or price_store.STORE_DIR
+    frame = price_store.load(args.tickers[0] if len(args.tickers) == 1 else args.tickers, store_dir=store_dir)
+    report = check(frame)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(summary(report).to_string())
+    raise SystemExit(0 if report['ok'] else 1)
+
+
+if __name__ == "__main__":
+    main()
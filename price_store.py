@@ -0,0 +1,224 @@
+# Typed columnar store of daily price histories, partitioned by ticker and year.
+#
+# Each ticker's bars are kept in <store dir>/<TICKER>/<year>.arrow, one
+# uncompressed Arrow IPC (Feather v2) file per calendar year, sorted by date:
+# Date as int64 days since the epoch (the bar's trading date), the bar's UTC
+# offset in minutes, and float64 OHLCV, dividends and splits. A load works out
+# from the tickers and the date range which partitions it needs and opens only
+# those: no directory scan over the other tickers, no reading of other years.
+# Files are memory-mapped, so only the columns asked for are read, and the
+# range is cut from the sorted Date column of the first and last year.
+#
+# Appends rewrite only the partitions they touch, normally the current year.
+# They replace the stored rows from their first day on, so revised trailing
+# rows and new ones go in the same way.
+#
+# The <ticker>_historical_data.csv files stay the import/export format:
+# market_data.py keeps the store in step with the rows it appends, a missing
+# ticker is imported from its CSV on first load, and export_csv() writes the
+# CSV back out in the format yfinance writes.
+#
+#   python price_store.py import EBAY
+#   python price_store.py export EBAY ebay_export.csv
+
+import argparse
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+import trading_dates
+
+STORE_DIR = os.environ.get('PRICE_STORE_DIR', 'price_store')
+
+COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits')
+SCHEMA = pa.schema([('Date', pa.int64()), ('UTC Offset', pa.int16())] + [(name, pa.float64()) for name in COLUMNS])
+
+_TICKER = re.compile(r'^[A-Za-z0-9^][A-Za-z0-9_.=-]*$')
+_PARTITION = re.compile(r'^(\d{4})\.arrow$')
+
+
+def ticker_dir(ticker, store_dir=STORE_DIR):
+    if not _TICKER.match(ticker):
+        raise ValueError(f"Invalid ticker {ticker!r}")
+    return os.path.join(store_dir, ticker.upper())
+
+
+def partition_path(ticker, year, store_dir=STORE_DIR):
+    return os.path.join(ticker_dir(ticker, store_dir), f'{year}.arrow')
+
+
+def stored_years(ticker, store_dir=STORE_DIR):
+    try:
+        names = os.listdir(ticker_dir(ticker, store_dir))
+    except FileNotFoundError:
+        return []
+    return sorted(int(match.group(1)) for match in map(_PARTITION.match, names) if match)
+
+
+def _day_number(day):
+    # A date string, datetime64, Timestamp or day number -> day number
+    return np.asarray(day, dtype='datetime64[D]').astype(np.int64)
+
+
+def _years(days):
+    return np.asarray(days, dtype='datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970
+
+
+def _empty(columns=None):
+    table = SCHEMA.empty_table()
+    return table if columns is None else table.select(['Date', 'UTC Offset'] + list(columns))
+
+
+def from_frame(frame):
+    # A history as yfinance returns it (or as read back from its CSV) -> Table
+    labels = frame.index
+    if isinstance(labels, pd.DatetimeIndex):
+        labels = labels.astype(str)
+    days, offsets = trading_dates.parse(labels)
+    arrays = [days.astype(np.int64), offsets] + [frame[name].to_numpy(dtype=np.float64) for name in COLUMNS]
+    return pa.Table.from_arrays(arrays, schema=SCHEMA)
+
+
+def write(path, table):
+    # Uncompressed, so readers can map the file instead of decoding it
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    feather.write_feather(table, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+
+
+def read_partition(path, columns=None, start=None, end=None):
+    # Rows with start <= Date <= end (datetime64[D]-likes, day numbers or
+    # None): Date and UTC Offset plus the given columns, as zero-copy views of
+    # the mapped file (the table's buffers keep the mapping alive)
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    if columns is not None:
+        table = table.select(['Date', 'UTC Offset'] + list(columns))
+    if start is None and end is None:
+        return table
+    dates = table.column('Date').to_numpy()
+    first = 0 if start is None else np.searchsorted(dates, _day_number(start))
+    last = len(dates) if end is None else np.searchsorted(dates, _day_number(end), 'right')
+    return table.slice(first, last - first)
+
+
+def read_table(ticker, start=None, end=None, columns=None, store_dir=STORE_DIR):
+    # One ticker's rows in [start, end], read from the partitions of those
+    # years only; an open-ended range lists the ticker's directory
+    if start is None or end is None:
+        years = stored_years(ticker, store_dir)
+        if not years:
+            return _empty(columns)
+    first_year = years[0] if start is None else int(_years(start))
+    last_year = years[-1] if end is None else int(_years(end))
+
+    tables = []
+    for year in range(first_year, last_year + 1):
+        # Only the first and last years can hold rows outside the range
+        bounds = (start if year == first_year else None, end if year == last_year else None)
+        try:
+            tables.append(read_partition(partition_path(ticker, year, store_dir), columns, *bounds))
+        except FileNotFoundError:
+            continue
+    return pa.concat_tables(tables) if tables else _empty(columns)
+
+
+def to_frame(table):
+    # Date is the trading date (datetime64[ns] at midnight, no time zone)
+    frame = pd.DataFrame({name: table.column(name).to_numpy() for name in table.column_names[2:]})
+    frame.insert(0, 'Date', table.column('Date').to_numpy().astype('datetime64[D]').astype('datetime64[ns]'))
+    return frame
+
+
+def write_ticker(ticker, table, store_dir=STORE_DIR):
+    # Replaces a ticker's whole history
+    years = _years(table.column('Date').to_numpy())
+    for year in np.unique(years):
+        rows = np.flatnonzero(years == year)
+        write(partition_path(ticker, year, store_dir), table.slice(rows[0], len(rows)))
+    for year in set(stored_years(ticker, store_dir)) - set(years.tolist()):
+        os.remove(partition_path(ticker, year, store_dir))
+
+
+def append(ticker, table, store_dir=STORE_DIR):
+    # Replaces the stored rows from the first day in `table` on with `table`
+    # (revised trailing rows plus new ones). Only the partitions of the years
+    # it covers, and of later years that held rows it replaces, are touched.
+    if not len(table):
+        return
+    days = table.column('Date').to_numpy()
+    years = _years(days)
+    for year in stored_years(ticker, store_dir):
+        if year > years[0] and year not in years:
+            os.remove(partition_path(ticker, year, store_dir))
+
+    for year in np.unique(years):
+        rows = np.flatnonzero(years == year)
+        part = table.slice(rows[0], len(rows))
+        path = partition_path(ticker, year, store_dir)
+        if year == years[0]:
+            try:
+                part = pa.concat_tables([read_partition(path, end=days[0] - 1), part])
+            except FileNotFoundError:
+                pass
+        write(path, part)
+
+
+def import_csv(csv_path, ticker, store_dir=STORE_DIR):
+    frame = pd.read_csv(csv_path, index_col='Date', float_precision='round_trip')
+    write_ticker(ticker, from_frame(frame), store_dir)
+
+
+def export_csv(ticker, csv_path, store_dir=STORE_DIR):
+    table = read_table(ticker, store_dir=store_dir)
+    days = table.column('Date').to_numpy().astype('datetime64[D]').astype(str)
+    offsets = table.column('UTC Offset').to_numpy().astype(np.int64)
+    signs = np.where(offsets < 0, '-', '+')
+    labels = [f'{day} 00:00:00{sign}{abs(offset) // 60:02d}:{abs(offset) % 60:02d}'
+              for day, sign, offset in zip(days, signs, offsets)]
+    frame = pd.DataFrame({name: table.column(name).to_numpy() for name in COLUMNS}, index=pd.Index(labels, name='Date'))
+    frame['Volume'] = frame['Volume'].astype(np.int64)
+    frame.to_csv(csv_path)
+
+
+def load(tickers, start=None, end=None, columns=None, store_dir=STORE_DIR, csv_dir='.'):
+    # Bars as a DataFrame with a Date column (trading dates) and the given
+    # columns (all of COLUMNS by default). One ticker gives its history, with
+    # the ticker imported from its CSV if the store does not have it yet; a
+    # list gives the tickers' histories one after another, with a Ticker column.
+    single = isinstance(tickers, str)
+    names = [tickers] if single else list(dict.fromkeys(tickers))
+    if single and not os.path.isdir(ticker_dir(tickers, store_dir)):
+        import market_data
+        import_csv(market_data.data_path(tickers, csv_dir), tickers, store_dir)
+
+    tables = [read_table(ticker, start, end, columns, store_dir) for ticker in names]
+    frame = to_frame(pa.concat_tables(tables) if tables else _empty(columns))
+    if not single:
+        ticker_column = np.repeat(np.arange(len(names)), [len(table) for table in tables])
+        frame.insert(0, 'Ticker', pd.Categorical.from_codes(ticker_column, categories=names))
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import or export a ticker's price history.")
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('ticker')
+    parser.add_argument('csv', nargs='?', help="CSV to read or write (default: the ticker's historical data CSV)")
+    parser.add_argument('--store-dir', default=STORE_DIR)
+    args = parser.parse_args()
+
+    import market_data
+    csv_path = args.csv or market_data.data_path(args.ticker)
+    if args.command == 'import':
+        import_csv(csv_path, args.ticker, args.store_dir)
+    else:
+        export_csv(args.ticker, csv_path, args.store_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,444 @@
+# NumPy-only inference for a fitted Prophet model.
+#
+# export_params() pulls the fitted parameters out of a Prophet object once;
+# ProphetEngine evaluates the forecast and its uncertainty intervals from those
+# arrays alone, so serving code never has to import prophet or cmdstanpy.
+#
+# yhat matches Prophet.predict exactly. The intervals simulate the same
+# generative model as Prophet's per-sample sampler (predict(vectorized=False)):
+# new trend changepoints arrive as a Poisson process after the end of the
+# history with Laplace-distributed rate changes, plus Gaussian observation
+# noise. They agree with Prophet's up to Monte Carlo error.
+#
+# Intervals can be computed three ways (`method` of predict):
+#   'samples'   Monte Carlo as above, with the model's sample count or fewer.
+#               Cost grows with days x samples; the bounds' Monte Carlo error
+#               grows as the count shrinks (about 1/sqrt(samples)).
+#   'analytic'  Gaussian with the simulation's variance: observation noise plus
+#               2 * rate * mean|delta|^2 * h^3 / 3 from changepoints h after
+#               the history. Costs about as much as yhat. Close to the sampled
+#               bounds over the first months; further out the changepoint
+#               distribution is heavy-tailed and the Gaussian drifts from it.
+#   'cached'    Bounds of draws simulated when the artifact was saved
+#               (CACHED_DRAW_DAYS days after the history), kept as offsets
+#               from yhat at the artifact's two interval levels. Matches the
+#               full sampler for those days at the cost of a lookup; any other
+#               day falls back to 'samples'. Adds 2 floats a day to the artifact.
+#
+# The simulation runs over at most `memory_budget` bytes of draws at a time:
+# days are simulated in time-ordered chunks and only each chunk's quantiles are
+# kept, so a multi-year request needs no (days x samples) matrix. Chunks draw
+# from the same random streams in the same order and carry the trend changes
+# forward, so the bounds are identical for any budget.
+#
+# save_artifact()/load_artifact() store the exported parameters as a compact,
+# versioned .npz of plain arrays plus JSON metadata, loaded without pickle.
+#
+#   python prophet_engine.py prophet.pkl prophet_engine.npz
+
+import argparse
+import hashlib
+import json
+import os
+from statistics import NormalDist
+
+import numpy as np
+
+ARTIFACT_FORMAT = 'prophet-engine'
+ARTIFACT_VERSION = 1
+
+# Exported parameters that are plain Python values; the rest are arrays
+SCALAR_PARAMS = ('growth', 'start', 't_scale', 'y_scale', 'last_ds', 'interval_width', 'uncertainty_samples')
+
+UNCERTAINTY_METHODS = ('samples', 'analytic', 'cached')
+
+# Days after the history covered by the draws cached in an artifact
+CACHED_DRAW_DAYS = 365
+
+# Bytes the uncertainty simulation may hold at once; long horizons are
+# simulated in chunks of days that fit. SIMULATION_ARRAYS is how many
+# (days x samples) float arrays a chunk keeps alive at its peak, and
+# ITERATION_ARRAYS how many (days x fitted iterations) ones: one per fitted
+# posterior draw, which an MCMC fit has hundreds of.
+SIMULATION_MEMORY_BUDGET = 64 * 1024 * 1024
+SIMULATION_ARRAYS = 10
+ITERATION_ARRAYS = 4
+
+# Days the engine forecasts. Timestamps are datetime64[ns], which only spans
+# 1677-09-21..2262-04-11; numpy wraps anything outside that into it without
+# an error, so a day at any time of day must fit.
+FIRST_DAY = np.datetime64('1677-09-22', 'D')
+LAST_DAY = np.datetime64('2262-04-10', 'D')
+
+
+def check_days(days):
+    # Raises ValueError for NaT or a day outside FIRST_DAY..LAST_DAY
+    days = np.asarray(days, dtype='datetime64[D]')
+    bad = np.isnat(days) | (days < FIRST_DAY) | (days > LAST_DAY)
+    if bad.any():
+        raise ValueError(f"Cannot forecast {days[bad][0]}: days must be between {FIRST_DAY} and {LAST_DAY}")
+    return days
+
+
+def to_timestamps(ds):
+    # datetime64[ns], checking the range first instead of letting the cast wrap
+    ds = np.asarray(ds)
+    if ds.dtype == np.dtype('datetime64[ns]'):
+        return ds
+    if ds.dtype.kind != 'M':
+        # Parsed at a unit wide enough not to wrap either
+        ds = ds.astype('datetime64[us]')
+    check_days(ds.astype('datetime64[D]'))
+    return ds.astype('datetime64[ns]')
+
+
+def export_params(model):
+    # Everything ProphetEngine needs from a fitted Prophet model, as plain
+    # floats, strings and NumPy arrays
+    if model.history is None:
+        raise ValueError("Model has not been fit.")
+    if model.growth not in ('linear', 'flat'):
+        raise ValueError(f"Unsupported growth {model.growth!r}; only linear and flat trends are exported.")
+    if model.logistic_floor or model.extra_regressors or model.train_holiday_names is not None:
+        raise ValueError("Floors, holidays and extra regressors are not supported by the NumPy engine.")
+    if any(props['condition_name'] is not None for props in model.seasonalities.values()):
+        raise ValueError("Conditional seasonalities are not supported by the NumPy engine.")
+
+    component_cols = model.train_component_cols
+    return {
+        'growth': model.growth,
+        'start': np.datetime64(model.start, 'ns').astype(np.int64),
+        't_scale': model.t_scale / np.timedelta64(1, 'ns'),
+        'y_scale': float(model.y_scale),
+        'last_ds': np.datetime64(model.history['ds'].max(), 'ns').astype(np.int64),
+        'changepoints_t': np.asarray(model.changepoints_t, dtype=np.float64),
+        'k': np.asarray(model.params['k'], dtype=np.float64).reshape(-1),
+        'm': np.asarray(model.params['m'], dtype=np.float64).reshape(-1),
+        'delta': np.atleast_2d(np.asarray(model.params['delta'], dtype=np.float64)),
+        'sigma_obs': np.asarray(model.params['sigma_obs'], dtype=np.float64).reshape(-1),
+        'beta': np.atleast_2d(np.asarray(model.params['beta'], dtype=np.float64)),
+        'seasonality_periods': np.array([props['period'] for props in model.seasonalities.values()], dtype=np.float64),
+        'seasonality_orders': np.array([props['fourier_order'] for props in model.seasonalities.values()], dtype=np.int64),
+        'additive_cols': component_cols['additive_terms'].to_numpy(dtype=np.float64),
+        'multiplicative_cols': component_cols['multiplicative_terms'].to_numpy(dtype=np.float64),
+        'interval_width': float(model.interval_width),
+        'uncertainty_samples': int(model.uncertainty_samples or 0),
+    }
+
+
+def training_metadata(model):
+    # Small description of the data the model was fit on
+    history = model.history
+    digest = hashlib.sha256()
+    digest.update(history['ds'].to_numpy(dtype='datetime64[ns]').astype(np.int64).tobytes())
+    digest.update(history['y'].to_numpy(dtype=np.float64).tobytes())
+    return {
+        'last_training_date': str(history['ds'].max().date()),
+        'training_rows': int(len(history)),
+        'data_hash': digest.hexdigest()[:16],
+    }
+
+
+def cached_draw_bounds(engine, n_days=CACHED_DRAW_DAYS, seed=0):
+    # Lower and upper bound of the simulated forecasts, as offsets from yhat,
+    # for each of the next `n_days` days: shape (n_days, 2). interval_width is
+    # fixed in the artifact, so no other levels are ever read.
+    days = engine.last_day + np.arange(1, n_days + 1)
+    ds = days.astype('datetime64[ns]') + engine.time_of_day
+    t = engine.scaled_time(ds)
+    X = engine.seasonal_features(ds)
+    yhat = engine.predict(ds, uncertainty_samples=0)['yhat']
+    bounds = np.empty((n_days, 2), dtype=np.float32)
+    for rows, draws in engine.simulate_chunks(t, X, engine.uncertainty_samples, seed):
+        bounds[rows] = np.percentile(draws - yhat[rows, None], engine.interval_levels(), axis=1).T
+    return bounds
+
+
+def save_artifact(model, path, cached_draw_days=CACHED_DRAW_DAYS):
+    # Write the exported parameters of a fitted Prophet model as a compact,
+    # pickle-free artifact; the file is replaced atomically
+    params = export_params(model)
+    if cached_draw_days and params['uncertainty_samples']:
+        params['draw_bounds'] = cached_draw_bounds(ProphetEngine(params), cached_draw_days)
+    metadata = dict(training_metadata(model), format=ARTIFACT_FORMAT, version=ARTIFACT_VERSION)
+    metadata['params'] = {name: params[name] for name in SCALAR_PARAMS}
+    metadata['params']['start'] = int(metadata['params']['start'])
+    metadata['params']['last_ds'] = int(metadata['params']['last_ds'])
+    arrays = {name: value for name, value in params.items() if name not in SCALAR_PARAMS}
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, metadata=np.array(json.dumps(metadata)), **arrays)
+    os.replace(tmp_path, path)
+    return metadata
+
+
+def load_artifact(path):
+    with np.load(path, allow_pickle=False) as data:
+        metadata = json.loads(str(data['metadata']))
+        if metadata.get('format') != ARTIFACT_FORMAT:
+            raise ValueError(f"{path} is not a {ARTIFACT_FORMAT} artifact")
+        if metadata.get('version') != ARTIFACT_VERSION:
+            raise ValueError(f"{path} has artifact version {metadata.get('version')}, expected {ARTIFACT_VERSION}")
+        params = dict(metadata.pop('params'))
+        params.update((name, data[name]) for name in data.files if name != 'metadata')
+    return ProphetEngine(params, metadata)
+
+
+def piecewise_linear(t, deltas, k, m, changepoint_ts):
+    # Same evaluation as Prophet.piecewise_linear
+    deltas_t = (changepoint_ts[None, :] <= t[..., None]) * deltas
+    k_t = deltas_t.sum(axis=1) + k
+    m_t = (deltas_t * -changepoint_ts).sum(axis=1) + m
+    return k_t * t + m_t
+
+
+class ProphetEngine:
+
+    def __init__(self, params, metadata=None):
+        self.params = params
+        self.metadata = metadata or {}
+        self.growth = params['growth']
+        self.start = int(params['start'])
+        self.t_scale = float(params['t_scale'])
+        self.y_scale = float(params['y_scale'])
+        self.last_ds = np.datetime64(int(params['last_ds']), 'ns')
+        self.changepoints_t = params['changepoints_t']
+        self.k = params['k']
+        self.m = params['m']
+        self.delta = params['delta']
+        self.sigma_obs = params['sigma_obs']
+        self.beta = params['beta']
+        self.seasonality_periods = params['seasonality_periods']
+        self.seasonality_orders = params['seasonality_orders']
+        self.additive_cols = params['additive_cols']
+        self.multiplicative_cols = params['multiplicative_cols']
+        self.interval_width = float(params['interval_width'])
+        self.uncertainty_samples = int(params['uncertainty_samples'])
+        # Only present in artifacts saved with cached draws
+        self.draw_bounds = params.get('draw_bounds')
+        self.memory_budget = SIMULATION_MEMORY_BUDGET
+
+        # Posterior means, as used by Prophet for yhat
+        self.beta_additive = np.nanmean(self.beta * self.additive_cols, axis=0) * self.y_scale
+        self.beta_multiplicative = np.nanmean(self.beta * self.multiplicative_cols, axis=0)
+
+    @classmethod
+    def from_model(cls, model):
+        return cls(export_params(model), training_metadata(model))
+
+    @property
+    def nbytes(self):
+        # Memory held by the engine's arrays (the other attributes are scalars)
+        arrays = list(self.params.values()) + [self.beta_additive, self.beta_multiplicative]
+        return sum(value.nbytes for value in arrays if isinstance(value, np.ndarray))
+
+    @property
+    def last_day(self):
+        return self.last_ds.astype('datetime64[D]')
+
+    @property
+    def time_of_day(self):
+        # Prophet was fit on timestamps at a fixed time of day; day-level
+        # predictions are made at the same time of day
+        return self.last_ds - self.last_day.astype('datetime64[ns]')
+
+    def scaled_time(self, ds):
+        return (ds.astype(np.int64) - self.start) / self.t_scale
+
+    def seasonal_features(self, ds):
+        # Fourier terms laid out like Prophet.make_all_seasonality_features
+        days = ds.astype(np.int64) // 10 ** 9 / (3600 * 24.)
+        columns = []
+        for period, order in zip(self.seasonality_periods, self.seasonality_orders):
+            x = 2 * np.pi * days[:, None] * np.arange(1, order + 1)[None, :] / period
+            columns.append(np.stack([np.sin(x), np.cos(x)], axis=2).reshape(len(ds), 2 * order))
+        if not columns:
+            return np.zeros((len(ds), self.beta.shape[1]))
+        return np.concatenate(columns, axis=1)
+
+    def trend(self, t, iteration=None):
+        # Trend on the y scale; posterior mean parameters unless an iteration is given
+        if iteration is None:
+            k, m, deltas = np.nanmean(self.k), np.nanmean(self.m), np.nanmean(self.delta, axis=0)
+        else:
+            k, m, deltas = self.k[iteration], self.m[iteration], self.delta[iteration]
+        if self.growth == 'flat':
+            return np.full(len(t), m) * self.y_scale
+        return piecewise_linear(t, deltas, k, m, self.changepoints_t) * self.y_scale
+
+    def predict(self, ds, uncertainty_samples=None, seed=0, method='samples'):
+        # yhat and interval bounds for an array of timestamps, in input order
+        ds = to_timestamps(ds)
+        t = self.scaled_time(ds)
+        X = self.seasonal_features(ds)
+
+        trend = self.trend(t)
+        yhat = trend * (1 + X @ self.beta_multiplicative) + X @ self.beta_additive
+        forecast = {'trend': trend, 'yhat': yhat}
+
+        n_samples = self.uncertainty_samples if uncertainty_samples is None else uncertainty_samples
+        if not n_samples:
+            return forecast
+        if method == 'samples':
+            bounds = self.sampled_bounds(t, X, n_samples, seed)
+        elif method == 'analytic':
+            bounds = self.analytic_bounds(t, X, yhat)
+        elif method == 'cached':
+            bounds = self.cached_bounds(ds, t, X, yhat, n_samples, seed)
+        else:
+            raise ValueError(f"Unknown uncertainty method {method!r}; expected one of {UNCERTAINTY_METHODS}")
+        forecast['yhat_lower'], forecast['yhat_upper'] = bounds
+        return forecast
+
+    def predict_days(self, days, uncertainty_samples=None, seed=0, method='samples'):
+        days = check_days(days)
+        return self.predict(days.astype('datetime64[ns]') + self.time_of_day, uncertainty_samples, seed, method)
+
+    def interval_levels(self):
+        # Percentiles of the lower and upper bound
+        return 100 * (1.0 - self.interval_width) / 2, 100 * (1.0 + self.interval_width) / 2
+
+    def sampled_bounds(self, t, X, n_samples, seed=0):
+        # Quantiles chunk by chunk, so the full (rows x samples) matrix never exists
+        lower = np.empty(len(t))
+        upper = np.empty(len(t))
+        for rows, draws in self.simulate_chunks(t, X, n_samples, seed):
+            lower[rows], upper[rows] = np.percentile(draws, self.interval_levels(), axis=1)
+        return lower, upper
+
+    def analytic_bounds(self, t, X, yhat):
+        # Observation noise, plus the variance of the trend changes arriving
+        # after the history: Laplace deltas (variance 2 * mean|delta|^2) at
+        # `rate` per unit of t, each acting for the time left until t
+        variance = np.full(len(t), np.mean(self.sigma_obs ** 2))
+        if self.growth != 'flat':
+            h = np.maximum(t - 1.0, 0.0)
+            mean_delta = np.mean(np.abs(self.delta), axis=1) + 1e-8
+            trend_variance = len(self.changepoints_t) * 2 * np.mean(mean_delta ** 2) * h ** 3 / 3
+            variance += trend_variance * (1 + X @ self.beta_multiplicative) ** 2
+        z = NormalDist().inv_cdf((1.0 + self.interval_width) / 2)
+        half_width = z * np.sqrt(variance) * self.y_scale
+        return yhat - half_width, yhat + half_width
+
+    def cached_bounds(self, ds, t, X, yhat, n_samples, seed=0):
+        # From the cached bounds for days they cover, sampled otherwise
+        lower = np.empty(len(t))
+        upper = np.empty(len(t))
+        cached = np.zeros(len(t), dtype=bool)
+        if self.draw_bounds is not None:
+            # Rows at the training time of day, 1..len(draw_bounds) days after the history
+            offset = ds - self.last_ds
+            day = offset // np.timedelta64(1, 'D')
+            whole_days = offset % np.timedelta64(1, 'D') == np.timedelta64(0)
+            cached = whole_days & (day >= 1) & (day <= len(self.draw_bounds))
+            rows = self.draw_bounds[day[cached] - 1]
+            lower[cached] = yhat[cached] + rows[:, 0]
+            upper[cached] = yhat[cached] + rows[:, 1]
+        if not cached.all():
+            lower[~cached], upper[~cached] = self.sampled_bounds(t[~cached], X[~cached], n_samples, seed)
+        return lower, upper
+
+    def simulate(self, t, X, n_samples, seed=0):
+        # Posterior predictive draws, shape (len(t), n_samples)
+        sims = np.empty((len(t), n_samples))
+        for rows, draws in self.simulate_chunks(t, X, n_samples, seed, chunk_rows=len(t)):
+            sims[rows] = draws
+        return sims
+
+    def chunk_rows(self, n_samples):
+        # Rows simulated at once so the working set stays within memory_budget
+        row_bytes = 8 * (n_samples * SIMULATION_ARRAYS + len(self.k) * ITERATION_ARRAYS)
+        return max(1, int(self.memory_budget // row_bytes))
+
+    def simulate_chunks(self, t, X, n_samples, seed=0, chunk_rows=None):
+        # Posterior predictive draws for at most `chunk_rows` rows at a time,
+        # in time order: yields (row indices, draws of shape (rows, n_samples)).
+        # Each random quantity comes from its own stream and is drawn row by
+        # row in time order, and the trend changes carry over from one chunk
+        # to the next, so the draws are identical whatever the chunk size.
+        counts_rng, positions_rng, deltas_rng, noise_rng = [
+            np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(4)]
+        chunk_rows = chunk_rows or self.chunk_rows(n_samples)
+
+        order = np.argsort(t, kind='stable')
+        iterations = np.arange(n_samples) % len(self.k)
+
+        # Seasonal effects per fitted iteration (one column each)
+        beta_a = (self.beta * self.additive_cols).T * self.y_scale
+        beta_m = (self.beta * self.multiplicative_cols).T
+
+        state = TrendState(n_samples)
+        for start in range(0, len(t), chunk_rows):
+            rows = order[start:start + chunk_rows]
+            t_chunk = t[rows]
+            X_chunk = X[rows]
+            seasonal_a = (X_chunk @ beta_a)[:, iterations]
+            seasonal_m = (X_chunk @ beta_m)[:, iterations]
+            trends = np.stack([self.trend(t_chunk, i) for i in range(len(self.k))], axis=1)[:, iterations]
+            trends += self.trend_deviation(t_chunk, n_samples, iterations, counts_rng, positions_rng,
+                                           deltas_rng, state)
+            noise = noise_rng.standard_normal((len(rows), n_samples)) * self.sigma_obs[iterations] * self.y_scale
+            yield rows, trends * (1 + seasonal_m) + seasonal_a + noise
+
+    def trend_deviation(self, t_sorted, n_samples, iterations, counts_rng, positions_rng, deltas_rng, state):
+        # Extra trend (y scale) from changepoints that arrive after the history
+        # ends (t = 1) at rate len(changepoints) per unit of t. `state` holds
+        # the slope and value reached at the end of the previous rows.
+        deviation = np.zeros((len(t_sorted), n_samples))
+        future = t_sorted > 1
+        if self.growth == 'flat' or not future.any():
+            return deviation
+
+        t_future = t_sorted[future]
+        dt = np.diff(t_future, prepend=state.t)
+        rate = len(self.changepoints_t)
+        mean_delta = np.mean(np.abs(self.delta), axis=1) + 1e-8
+
+        # Number of new changepoints per (row, sample) interval, then their
+        # positions within the interval and their rate changes
+        counts = counts_rng.poisson(rate * dt[:, None], size=(len(dt), n_samples))
+        n_changes = int(counts.sum())
+        cell = np.repeat(np.arange(counts.size), counts.ravel())
+        positions = positions_rng.random(n_changes)
+        deltas = deltas_rng.laplace(0.0, 1.0, n_changes) * mean_delta[iterations[cell % n_samples]]
+
+        # Slope added in each interval, and its effect on the value at the end of that interval
+        slope_added = np.bincount(cell, weights=deltas, minlength=counts.size).reshape(counts.shape)
+        value_added = np.bincount(cell, weights=deltas * (1 - positions) * dt[cell // n_samples],
+                                  minlength=counts.size).reshape(counts.shape)
+
+        # Running sums start from the carried state, summed in the same order
+        # as if all rows were one chunk
+        slope = np.cumsum(np.vstack([state.slope, slope_added]), axis=0)[1:]
+        value = np.cumsum(np.vstack([state.value, (slope - slope_added) * dt[:, None] + value_added]), axis=0)[1:]
+        state.t, state.slope, state.value = t_future[-1], slope[-1], value[-1]
+        deviation[future] = value * self.y_scale
+        return deviation
+
+
+class TrendState:
+    # Where the simulated trend changes stand after the rows drawn so far
+
+    def __init__(self, n_samples):
+        self.t = 1.0
+        self.slope = np.zeros(n_samples)
+        self.value = np.zeros(n_samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a pickled Prophet model to a compact engine artifact.")
+    parser.add_argument('model', help="joblib pickle of a fitted Prophet model")
+    parser.add_argument('artifact', help="where to write the .npz artifact")
+    parser.add_argument('--cached-draw-days', type=int, default=CACHED_DRAW_DAYS,
+                        help="days of simulated draws to cache for 'cached' uncertainty (0 for none)")
+    args = parser.parse_args()
+
+    import joblib
+    metadata = save_artifact(joblib.load(args.model), args.artifact, args.cached_draw_days)
+    print(f"Wrote {args.artifact} ({os.path.getsize(args.artifact)} bytes), "
+          f"trained on {metadata['training_rows']} rows up to {metadata['last_training_date']}")
+
+
+if __name__ == "__main__":
+    main()
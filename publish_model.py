@@ -0,0 +1,114 @@
+# Publish a trained model for the app and API to serve.
+#
+# The model is exported and checked in a staging directory and its forecast
+# table is precomputed there. The directory is then renamed to
+# models/<series>/releases/<version>, and only after that does the series'
+# CURRENT pointer flip to it. Serving processes pick the new version up on
+# their next model check; requests already running finish on the version they
+# started with, whose release stays on disk (the newest KEEP_RELEASES are kept).
+#
+#   python publish_model.py prophet.pkl --series EBAY
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+import forecasting
+from prophet_engine import load_artifact, save_artifact
+
+logger = logging.getLogger(__name__)
+
+# Published releases kept per series, including the current one
+KEEP_RELEASES = 3
+
+
+def validate(engine):
+    # A model that cannot produce sane forecasts is never published
+    days = engine.last_day + np.array([1, 7, 30, 365])
+    forecast = engine.predict_days(days)
+    yhat, lower, upper = forecast['yhat'], forecast['yhat_lower'], forecast['yhat_upper']
+    if not (np.isfinite(yhat).all() and np.isfinite(lower).all() and np.isfinite(upper).all()):
+        raise ValueError("model produces non-finite forecasts")
+    if not ((lower <= yhat) & (yhat <= upper)).all():
+        raise ValueError("model forecasts fall outside their own intervals")
+
+
+def write_pointer(series_id, version):
+    path = os.path.join(forecasting.series_dir(series_id), forecasting.CURRENT_POINTER)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': version, 'published_at': datetime.datetime.now().isoformat(timespec='seconds')}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def prune_releases(series_id, keep=KEEP_RELEASES):
+    releases = os.path.join(forecasting.series_dir(series_id), forecasting.RELEASES_DIR)
+    current = forecasting.current_release(series_id)
+    names = [name for name in os.listdir(releases) if not name.startswith('.')]
+    names.sort(key=lambda name: os.path.getmtime(os.path.join(releases, name)), reverse=True)
+    for name in names[keep:]:
+        if name != current:
+            shutil.rmtree(os.path.join(releases, name), ignore_errors=True)
+
+
+def publish(model, series_id=forecasting.DEFAULT_SERIES, horizon_days=forecasting.FORECAST_HORIZON_DAYS):
+    # `model` is a fitted Prophet model or the path of an engine artifact or
+    # a pickled model. Returns the published version.
+    releases = os.path.join(forecasting.series_dir(series_id), forecasting.RELEASES_DIR)
+    os.makedirs(releases, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=releases)
+    try:
+        model_path = os.path.join(staging, forecasting.MODEL_PATH)
+        if isinstance(model, str) and model.endswith('.npz'):
+            shutil.copyfile(model, model_path)
+        else:
+            if isinstance(model, str):
+                import joblib
+                model = joblib.load(model)
+            save_artifact(model, model_path)
+
+        engine = load_artifact(model_path)
+        validate(engine)
+        version = forecasting.file_version(model_path)
+        # Warm up: the new version's forecast table exists before anything can serve it
+        table_path = os.path.join(staging, forecasting.FORECAST_TABLE_PATH)
+        forecasting.build_forecast_table(engine, horizon_days, path=table_path, model_path=model_path)
+
+        release = os.path.join(releases, version)
+        if os.path.exists(release):
+            # Republishing an identical model: its release is already complete
+            shutil.rmtree(staging)
+            os.utime(release)
+        else:
+            os.rename(staging, release)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    write_pointer(series_id, version)
+    logger.info("Published %s version %s", series_id, version)
+    prune_releases(series_id)
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate, warm and publish a trained model.")
+    parser.add_argument('model', help="prophet_engine.npz artifact or pickled Prophet model")
+    parser.add_argument('--series', default=forecasting.DEFAULT_SERIES)
+    parser.add_argument('--horizon-days', type=int, default=forecasting.FORECAST_HORIZON_DAYS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(publish(args.model, args.series, args.horizon_days))
+
+
+if __name__ == "__main__":
+    main()
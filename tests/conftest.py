@@ -0,0 +1,9 @@
+# The modules live at the top of the repository; run the tests from there:
+#
+#   python -m pytest tests
+
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
@@ -0,0 +1,101 @@
+import http.client
+import json
+import threading
+
+import numpy as np
+import pytest
+
+import api
+
+from conftest import REPO_DIR
+
+
+@pytest.fixture(scope='module')
+def server():
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.chdir(REPO_DIR)
+        server = api.make_server('127.0.0.1', 0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        yield server
+        server.shutdown()
+        server.server_close()
+
+
+def post(server, body, headers=None):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=10)
+    connection.putrequest('POST', '/forecast')
+    for name, value in (headers or {'Content-Length': str(len(body))}).items():
+        connection.putheader(name, value)
+    connection.endheaders()
+    connection.send(body)
+    response = connection.getresponse()
+    payload = json.loads(response.read())
+    connection.close()
+    return response.status, payload
+
+
+def test_parse_days():
+    assert api.parse_days(['2024-12-12', '2024-02-29']).tolist() == \
+        np.array(['2024-12-12', '2024-02-29'], dtype='datetime64[D]').tolist()
+
+
+@pytest.mark.parametrize('value', [None, 123, 1.5, True, 'nat', 'NaT', '2024', '2024-12', '2024-12-12T00:00',
+                                   '2024-02-30', '2023-02-29', ['2024-12-12'], '1500-01-01', '1677-09-21',
+                                   '2262-04-11', '9999-12-31', '0001-01-01'])
+def test_parse_days_rejects(value):
+    with pytest.raises(api.BadRequest):
+        api.parse_days([value])
+
+
+def test_post_forecast(server):
+    status, payload = post(server, b'{"dates": ["2024-12-12"]}')
+    assert status == 200
+    assert [forecast['date'] for forecast in payload['forecasts']] == ['2024-12-12']
+
+
+@pytest.mark.parametrize('body', [b'{"dates": [null]}', b'{"dates": [123]}', b'{"dates": ["2024"]}',
+                                  b'{"dates": "2024-12-12"}', b'not json'])
+def test_post_invalid_dates(server, body):
+    status, payload = post(server, body)
+    assert status == 400 and 'error' in payload
+
+
+@pytest.mark.parametrize('length', ['-1', 'abc', '1.5'])
+def test_post_invalid_content_length(server, length):
+    status, payload = post(server, b'', {'Content-Length': length})
+    assert status == 400 and payload['error'] == "Invalid Content-Length"
+
+
+def test_get_invalid_date(server):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=10)
+    connection.request('GET', '/forecast?date=nat')
+    response = connection.getresponse()
+    assert response.status == 400
+    connection.close()
+
+
+def test_background_server_port_taken(monkeypatch):
+    monkeypatch.setattr(api, '_background_server', None)
+    monkeypatch.setattr(api, '_background_failed', False)
+    taken = api.make_server('127.0.0.1', 0)
+    calls = []
+    make_server = api.make_server
+    monkeypatch.setattr(api, 'make_server', lambda *args: calls.append(args) or make_server(*args))
+    try:
+        port = taken.server_address[1]
+        assert api.start_background_server('127.0.0.1', port) is None
+        # Later reruns neither retry the bind nor fail
+        assert api.start_background_server('127.0.0.1', port) is None
+        assert len(calls) == 1
+    finally:
+        taken.server_close()
+
+
+@pytest.mark.parametrize('query', ['date=1500-01-01', 'start=2262-04-10&end=2262-04-13'])
+def test_get_days_out_of_range(server, query):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=10)
+    connection.request('GET', '/forecast?' + query)
+    response = connection.getresponse()
+    assert response.status == 400
+    assert 'between' in json.loads(response.read())['error']
+    connection.close()
@@ -0,0 +1,105 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+import batch_forecast
+from batch_forecast import DayUnion, parse_request
+
+from conftest import REPO_DIR
+
+
+def expected_days(intervals):
+    days = set()
+    for start, end in intervals:
+        days.update(range(start, end + 1))
+    return np.array(sorted(days), dtype=np.int64).astype('datetime64[D]')
+
+
+@pytest.mark.parametrize('compact_every', [1, 7, 100000])
+def test_day_union_matches_a_set(monkeypatch, compact_every):
+    monkeypatch.setattr(batch_forecast, 'COMPACT_EVERY', compact_every)
+    rng = np.random.default_rng(0)
+    starts = rng.integers(19000, 19400, 500)
+    intervals = [(int(start), int(start + length)) for start, length in zip(starts, rng.integers(0, 6, 500))]
+
+    union = DayUnion()
+    for start, end in intervals:
+        union.add(start, end)
+    assert np.array_equal(union.days(), expected_days(intervals))
+
+
+def test_day_union_merges_adjacent_and_nested_intervals():
+    union = DayUnion()
+    for start, end in [(10, 12), (13, 13), (20, 30), (22, 25), (5, 5), (31, 31), (7, 8)]:
+        union.add(start, end)
+    union.compact()
+    assert union.intervals.tolist() == [[5, 5], [7, 8], [10, 13], [20, 31]]
+
+    # Compacting again folds new days into the merged intervals
+    union.add(6, 6)
+    union.add(14, 19)
+    union.compact()
+    assert union.intervals.tolist() == [[5, 8], [10, 31]]
+
+
+def test_day_union_empty():
+    assert len(DayUnion().days()) == 0
+
+
+def test_parse_request():
+    request, start, end = parse_request('{"id": "a", "date": "2024-12-12"}')
+    assert request['id'] == 'a' and start == end == np.datetime64('2024-12-12')
+    _, start, end = parse_request('{"start": "2024-12-01", "end": "2024-12-31"}')
+    assert (start, end) == (np.datetime64('2024-12-01'), np.datetime64('2024-12-31'))
+    _, start, end = parse_request('{"start": "1970-01-01", "end": "2024-10-03"}')
+    assert (end - start).astype(int) + 1 == batch_forecast.MAX_DATES_PER_REQUEST
+
+
+@pytest.mark.parametrize('line', [
+    '{"date": "nat"}',
+    '{"date": "NaT"}',
+    '{"date": "2024"}',
+    '{"date": "2024-12"}',
+    '{"date": "2024-12-12T10:00"}',
+    '{"date": "2024-12-12\\n"}',
+    '{"date": "2024-02-30"}',
+    '{"date": null}',
+    '{"date": 20241212}',
+    '{"start": "2024-12-01", "end": "nat"}',
+    '{"start": "2024-12-31", "end": "2024-12-01"}',
+    '{"start": "2024-12-01"}',
+    '{"date": "1500-01-01"}',
+    '{"date": "2262-04-11"}',
+    '{"start": "2262-04-10", "end": "2262-04-13"}',
+    '{"start": "0001-01-01", "end": "9999-12-31"}',
+    '{"start": "1900-01-01", "end": "2024-12-31"}',
+    '["2024-12-12"]',
+    'not json',
+])
+def test_parse_request_rejects(line):
+    with pytest.raises(ValueError):
+        parse_request(line)
+
+
+def test_batch_reports_bad_lines_and_keeps_going(tmp_path, monkeypatch):
+    monkeypatch.chdir(REPO_DIR)
+    requests = tmp_path / 'requests.jsonl'
+    requests.write_text('\n'.join([
+        '{"id": "a", "date": "2024-12-12"}',
+        '{"id": "nat", "date": "nat"}',
+        '{"id": "year", "date": "2024"}',
+        '',
+        '{"id": "b", "start": "2024-12-10", "end": "2024-12-12"}',
+    ]) + '\n')
+    out = io.StringIO()
+    batch_forecast.run_batch(str(requests), out)
+    responses = [json.loads(line) for line in out.getvalue().splitlines()]
+
+    assert [response.get('id') for response in responses] == ['a', None, None, 'b']
+    assert responses[0]['date'] == '2024-12-12'
+    assert [response['line'] for response in responses[1:3]] == [2, 3]
+    assert all('error' in response for response in responses[1:3])
+    assert [day['date'] for day in responses[3]['forecasts']] == ['2024-12-10', '2024-12-11', '2024-12-12']
+    assert responses[3]['forecasts'][-1]['yhat'] == responses[0]['yhat']
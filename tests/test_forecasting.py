@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+import pytest
+
+import forecasting
+from prophet_engine import load_artifact
+
+from conftest import REPO_DIR
+
+
+@pytest.fixture(scope='module')
+def model():
+    return load_artifact(os.path.join(REPO_DIR, forecasting.MODEL_PATH))
+
+
+@pytest.mark.parametrize('spec, options', [
+    ('samples', {'method': 'samples'}),
+    ('samples:200', {'method': 'samples', 'uncertainty_samples': 200}),
+    ('analytic', {'method': 'analytic'}),
+    ('cached', {'method': 'cached'}),
+])
+def test_uncertainty_options(spec, options):
+    assert forecasting.uncertainty_options(spec) == options
+
+
+@pytest.mark.parametrize('spec', ['samples:0', 'samples:-5', 'samples:abc', 'samples:', 'samples:1.5', 'bootstrap'])
+def test_uncertainty_options_rejects(spec):
+    with pytest.raises(ValueError, match='FORECAST_UNCERTAINTY'):
+        forecasting.uncertainty_options(spec)
+
+
+def test_horizon_extends_only_across_close_days(tmp_path, monkeypatch, model):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(forecasting.series_dir('TESTSERIES'))
+    cache = forecasting.HorizonCache('TESTSERIES')
+    last = model.last_day
+
+    def table_end():
+        path = forecasting.table_path('TESTSERIES', 'v1')
+        return forecasting.get_forecast_table('v1', path).end_day
+
+    # Days after a gap longer than max_gap_days are predicted live
+    days = last + np.array([300, 600, 5900])
+    forecast = cache.forecast(model, 'v1', days)
+    assert forecast['ds'].dt.date.astype(str).tolist() == days.astype(str).tolist()
+    assert table_end() == last + 600
+
+    cache.forecast(model, 'v1', last + np.array([1000, 1060]))
+    assert table_end() == last + 600
+
+    # Never past max_extension_days after the first FORECAST_HORIZON_DAYS
+    cache.forecast(model, 'v1', last + np.array([900, 1200]))
+    assert table_end() == last + 900
+    assert forecasting.FORECAST_HORIZON_DAYS + cache.max_extension_days < 1200
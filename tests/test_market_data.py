@@ -0,0 +1,56 @@
+import os
+
+import pandas as pd
+import pytest
+
+import market_data
+import price_store
+
+from conftest import REPO_DIR
+
+
+@pytest.fixture(scope='module')
+def history():
+    path = os.path.join(REPO_DIR, market_data.data_path('EBAY', '.'))
+    return pd.read_csv(path, index_col='Date', float_precision='round_trip').iloc[-300:]
+
+
+def write_source(directory, frame):
+    os.makedirs(directory, exist_ok=True)
+    frame.to_csv(market_data.data_path('EBAY', directory))
+    return market_data.ReplayFetcher(directory)
+
+
+def test_refresh_appends_new_bars(tmp_path, history):
+    data_dir, store_dir = str(tmp_path / 'data'), str(tmp_path / 'store')
+    write_source(data_dir, history.iloc[:-20])
+    fetcher = write_source(str(tmp_path / 'source'), history)
+
+    result = market_data.refresh('EBAY', fetcher, data_dir, store_dir=store_dir)
+    assert result == {'ticker': 'EBAY', 'appended': 20, 'revised': 0, 'full': False}
+    assert len(price_store.load('EBAY', store_dir=store_dir, csv_dir=data_dir)) == len(history)
+
+
+@pytest.mark.parametrize('rows', [0, 200])
+@pytest.mark.parametrize('csv_kept', [True, False])
+def test_full_download_that_would_lose_bars_is_refused(tmp_path, history, rows, csv_kept):
+    # An empty download, or one that ends before the stored history, after
+    # the stored anchor row changed (or with no CSV left to compare with)
+    data_dir, store_dir = str(tmp_path / 'data'), str(tmp_path / 'store')
+    write_source(data_dir, history)
+    csv_path = market_data.data_path('EBAY', data_dir)
+    price_store.import_csv(csv_path, 'EBAY', store_dir)
+    source = history.iloc[:rows].copy()
+    source['Close'] *= 2
+    fetcher = write_source(str(tmp_path / 'source'), source)
+    if not csv_kept:
+        os.remove(csv_path)
+    before = open(csv_path, 'rb').read() if csv_kept else None
+
+    with pytest.raises(ValueError, match='nothing was changed'):
+        market_data.refresh('EBAY', fetcher, data_dir, store_dir=store_dir)
+    if csv_kept:
+        assert open(csv_path, 'rb').read() == before
+    else:
+        assert not os.path.exists(csv_path)
+    assert len(price_store.read_table('EBAY', store_dir=store_dir)) == len(history)
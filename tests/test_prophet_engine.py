@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pytest
+
+import forecasting
+from prophet_engine import ITERATION_ARRAYS, SIMULATION_ARRAYS, load_artifact
+
+from conftest import REPO_DIR
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return load_artifact(os.path.join(REPO_DIR, forecasting.MODEL_PATH))
+
+
+def inputs(engine, days):
+    ds = (engine.last_day + np.asarray(days)).astype('datetime64[ns]') + engine.time_of_day
+    return engine.scaled_time(ds), engine.seasonal_features(ds)
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 7, 64, 1000])
+def test_simulate_chunks_do_not_depend_on_chunk_size(engine, chunk_rows):
+    # History days, future days and a long gap, out of order
+    t, X = inputs(engine, [400, -30, 1, 2, 3, 900, 10, -1, 365])
+    whole = engine.simulate(t, X, 50, seed=3)
+
+    draws = np.empty_like(whole)
+    for rows, chunk in engine.simulate_chunks(t, X, 50, seed=3, chunk_rows=chunk_rows):
+        draws[rows] = chunk
+    assert np.array_equal(draws, whole)
+
+
+def test_sampled_bounds_do_not_depend_on_memory_budget(engine, monkeypatch):
+    t, X = inputs(engine, np.arange(1, 800))
+    expected = engine.sampled_bounds(t, X, 200)
+    # A few rows at a time
+    row_bytes = 8 * (200 * SIMULATION_ARRAYS + len(engine.k) * ITERATION_ARRAYS)
+    monkeypatch.setattr(engine, 'memory_budget', row_bytes * 5)
+    assert engine.chunk_rows(200) == 5
+    lower, upper = engine.sampled_bounds(t, X, 200)
+    assert np.array_equal(lower, expected[0]) and np.array_equal(upper, expected[1])
+
+
+def test_simulation_is_seeded(engine):
+    t, X = inputs(engine, [1, 100, 200])
+    assert np.array_equal(engine.simulate(t, X, 20, seed=1), engine.simulate(t, X, 20, seed=1))
+    assert not np.array_equal(engine.simulate(t, X, 20, seed=1), engine.simulate(t, X, 20, seed=2))
+
+
+def test_cached_bounds_match_the_sampler(engine):
+    # Cached for the first CACHED_DRAW_DAYS days, sampled after
+    assert engine.draw_bounds.shape == (365, 2)
+    days = engine.last_day + np.arange(1, 400)
+    cached = engine.predict_days(days, method='cached')
+    sampled = engine.predict_days(days)
+    for bound in ('yhat_lower', 'yhat_upper'):
+        assert np.allclose(cached[bound][:365], sampled[bound][:365], atol=1e-4)
+    assert np.array_equal(cached['yhat_lower'][365:], engine.predict_days(days[365:])['yhat_lower'])
+
+
+@pytest.mark.parametrize('day', ['1500-01-01', '1677-09-21', '2262-04-11', '9999-12-31', 'NaT'])
+def test_days_outside_the_timestamp_range_are_rejected(engine, day):
+    # A cast to datetime64[ns] would wrap them onto another date
+    with pytest.raises(ValueError, match='between'):
+        engine.predict_days([day])
+    with pytest.raises(ValueError, match='between'):
+        engine.predict([day])
+
+
+def test_days_at_the_ends_of_the_range(engine):
+    days = np.array(['1677-09-22', '2024-12-12', '2262-04-10'], dtype='datetime64[D]')
+    forecast = engine.predict_days(days, uncertainty_samples=0)
+    assert len(np.unique(forecast['yhat'])) == 3
+    assert forecast['yhat'][1] == engine.predict_days(days[1:2], uncertainty_samples=0)['yhat'][0]
@@ -0,0 +1,95 @@
+import datetime
+
+import numpy as np
+import pytest
+
+import trading_dates
+
+
+def is_digits(chars):
+    return all(48 <= c <= 57 for c in chars)
+
+
+def test_two_digits_every_byte_pair():
+    x = np.arange(1 << 16, dtype=np.uint32)
+    value, ok = trading_dates._two_digits(x.astype('>u2'))
+    expected_ok = np.array([is_digits((v >> 8, v & 0xFF)) for v in range(1 << 16)])
+    assert np.array_equal(ok, expected_ok)
+    digits = x[expected_ok]
+    assert np.array_equal(value[expected_ok], ((digits >> 8) - 48) * 10 + (digits & 0xFF) - 48)
+
+
+def test_four_digits():
+    rng = np.random.default_rng(0)
+    # Every 4-digit number, then random words with one byte just outside the
+    # digit range or anything at all
+    numbers = np.array([int.from_bytes(f'{n:04d}'.encode(), 'big') for n in range(10000)], dtype=np.uint32)
+    near = np.array([0x2F, 0x3A, 0x30 + 0x80, 0x39 + 0x80, 0x20, 0x00, 0xFF], dtype=np.uint32)
+    words = numbers[rng.integers(0, 10000, 20000)]
+    shift = 8 * rng.integers(0, 4, 20000).astype(np.uint32)
+    broken = (words & ~(np.uint32(0xFF) << shift)) | (near[rng.integers(0, len(near), 20000)] << shift)
+    noise = rng.integers(0, 1 << 32, 200000, dtype=np.uint64).astype(np.uint32)
+
+    value, ok = trading_dates._four_digits(numbers.astype('>u4'))
+    assert ok.all() and np.array_equal(value, np.arange(10000))
+    for x in (broken, noise):
+        _, ok = trading_dates._four_digits(x.astype('>u4'))
+        expected = np.array([is_digits(int(v).to_bytes(4, 'big')) for v in x])
+        assert np.array_equal(ok, expected)
+
+
+def test_parse_matches_fromisoformat():
+    rng = np.random.default_rng(1)
+    days = rng.integers(-200000, 200000, 50000).astype('datetime64[D]')
+    days = days[(days >= np.datetime64('0001-01-01')) & (days <= np.datetime64('9999-12-31'))]
+    offsets = rng.integers(-14 * 60, 14 * 60 + 1, len(days)).astype(np.int16)
+    values = [f'{day} 00:00:00{"-" if m < 0 else "+"}{abs(m) // 60:02d}:{abs(m) % 60:02d}'
+              for day, m in zip(days.astype(str), offsets.tolist())]
+
+    parsed_days, parsed_offsets = trading_dates.parse(values)
+    assert np.array_equal(parsed_offsets, offsets)
+    expected = [datetime.datetime.fromisoformat(value) for value in values]
+    assert parsed_days.astype(str).tolist() == [str(stamp.date()) for stamp in expected]
+    assert parsed_offsets.tolist() == [stamp.utcoffset() // datetime.timedelta(minutes=1) for stamp in expected]
+
+
+def test_parse_across_chunks():
+    values = np.array(['1998-09-24 00:00:00-04:00', '2024-12-12 00:00:00-05:00'] * (trading_dates.CHUNK_ROWS + 3))
+    days, offsets = trading_dates.parse(values)
+    assert days[-2:].astype(str).tolist() == ['1998-09-24', '2024-12-12']
+    assert offsets[-2:].tolist() == [-240, -300]
+
+
+@pytest.mark.parametrize('value', [
+    '2024-02-30 00:00:00-05:00',
+    '2023-02-29 00:00:00-05:00',
+    '1900-02-29 00:00:00-05:00',
+    '2024-13-01 00:00:00-05:00',
+    '2024-00-10 00:00:00-05:00',
+    '2024-12-00 00:00:00-05:00',
+    '2024-12-12 24:00:00-05:00',
+    '2024-12-12 00:60:00-05:00',
+    '2024-12-12 00:00:00-05:60',
+    '2024-12-12 00:00:00*05:00',
+    '2024-12-12T00:00:00-05:00',
+    '2024/12/12 00:00:00-05:00',
+    '2024-12-12 00:00:00-05:00 ',
+    '2024-12-12 00:00:00-05:00Z',
+    '2024-12-12 00:00:00',
+    '2024-12-12',
+    '2024-1:-12 00:00:00-05:00',
+    '2O24-12-12 00:00:00-05:00',
+    '2024-12-12 00:00:00-05:0/',
+    '2024-12-12 00:00:00-0٥:00',
+    'nat',
+    '',
+])
+def test_parse_rejects(value):
+    values = ['2024-12-11 00:00:00-05:00', value]
+    with pytest.raises(ValueError, match='row 1|ASCII'):
+        trading_dates.parse(values)
+
+
+def test_parse_accepts_leap_days():
+    days, _ = trading_dates.parse(['2024-02-29 00:00:00-05:00', '2000-02-29 00:00:00-05:00'])
+    assert days.astype(str).tolist() == ['2024-02-29', '2000-02-29']
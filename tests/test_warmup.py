@@ -0,0 +1,43 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import forecasting
+import warmup
+
+from conftest import REPO_DIR
+
+
+def test_upcoming_days():
+    class Model:
+        last_day = np.datetime64('2024-08-27')
+
+    assert warmup.upcoming_days(Model, 2, '2026-10-18').astype(str).tolist() == ['2026-10-19', '2026-10-20']
+    assert warmup.upcoming_days(Model, 2, '2024-01-05').astype(str).tolist() == ['2024-08-28', '2024-08-29']
+
+
+def test_page_requests_after_warmup_skip_the_model(tmp_path, monkeypatch):
+    # A model well past its forecast table: the warmed days are further past
+    # the table than forecast() would extend it on its own
+    monkeypatch.chdir(tmp_path)
+    series_id = 'WARMSERIES'
+    os.makedirs(forecasting.series_dir(series_id))
+    shutil.copy(os.path.join(REPO_DIR, forecasting.MODEL_PATH),
+                os.path.join(forecasting.series_dir(series_id), forecasting.MODEL_PATH))
+    manifest = tmp_path / 'warmup.json'
+    manifest.write_text(json.dumps({'series': [series_id]}))
+
+    with forecasting.use_model(series_id) as (model, model_version):
+        today = model.last_day + forecasting.FORECAST_HORIZON_DAYS + forecasting.MAX_HORIZON_GAP_DAYS + 30
+        warmup.run(days=60, manifest_path=str(manifest), today=today)
+
+        def predict_days(*args, **kwargs):
+            raise AssertionError("predicted live")
+
+        monkeypatch.setattr(model, 'predict_days', predict_days)
+        for days in (today + np.arange(5, 6), today + np.arange(10, 41)):
+            forecast = forecasting.forecast_dates(model, model_version, days, series_id=series_id)
+            assert forecast['ds'].dt.date.astype(str).tolist() == days.astype(str).tolist()
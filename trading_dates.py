@@ -0,0 +1,104 @@
+# Fixed-format parser for the Date column of the price history CSVs.
+#
+# yfinance writes each daily bar's timestamp as local midnight with its UTC
+# offset, '1998-09-24 00:00:00-04:00', the offset flipping between -04:00 and
+# -05:00 with daylight saving. What the models want is the trading date,
+# 1998-09-24; going through pd.to_datetime(utc=True) instead lands on 04:00 or
+# 05:00 UTC of that date. parse() returns the trading dates as datetime64[D]
+# and the offsets (minutes east of UTC), which are kept for writing the CSV
+# back out. Anything that does not match the layout exactly is rejected.
+#
+# The values are copied once into fixed-width bytes and every field is read
+# through a structured view of them, two or four digits per integer load;
+# rows go CHUNK_ROWS at a time so the temporaries stay in cache.
+#
+#   days, offsets = trading_dates.parse(frame['Date'])
+
+import numpy as np
+
+# 'YYYY-MM-DD HH:MM:SS+HH:MM', plus one byte that must be empty, so longer
+# values are caught instead of cut to fit
+WIDTH = 26
+LAYOUT = np.dtype({
+    'names': ['year', 'month', 'day', 'hour', 'minute', 'second', 'offset_hours', 'offset_minutes',
+              'dash1', 'dash2', 'space', 'colon1', 'colon2', 'sign', 'colon3', 'end'],
+    'formats': ['>u4'] + ['>u2'] * 7 + ['u1'] * 8,
+    'offsets': [0, 5, 8, 11, 14, 17, 20, 23, 4, 7, 10, 13, 16, 19, 22, 25],
+    'itemsize': WIDTH,
+})
+SEPARATORS = [('dash1', b'-'), ('dash2', b'-'), ('space', b' '), ('colon1', b':'), ('colon2', b':'),
+              ('colon3', b':'), ('end', b'\0')]
+
+CHUNK_ROWS = 1 << 16
+
+# Days in each month of a non-leap year, indexed by month (0 unused)
+MONTH_DAYS = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31], dtype=np.int32)
+
+
+def _two_digits(field):
+    # Big-endian pair of ASCII bytes -> (value, both bytes are digits)
+    x = field.astype(np.uint16)
+    ok = ((x & 0xF0F0) == 0x3030) & (((x + 0x0606) & 0xF0F0) == 0x3030)
+    return ((x >> 8) - 48) * 10 + (x & 0xFF) - 48, ok
+
+
+def _four_digits(field):
+    x = field.astype(np.uint32)
+    ok = ((x & 0xF0F0F0F0) == 0x30303030) & (((x + 0x06060606) & 0xF0F0F0F0) == 0x30303030)
+    high, _ = _two_digits(x >> 16)
+    low, _ = _two_digits(x & 0xFFFF)
+    return high * 100 + low, ok
+
+
+def _days_from_civil(year, month, day):
+    # Days since 1970-01-01 of a proleptic Gregorian date (H. Hinnant's algorithm)
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * np.where(month > 2, month - 3, month + 9) + 2) // 5 + day - 1
+    return era * 146097 + year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year - 719468
+
+
+def _parse_chunk(fields):
+    # -> (day numbers, offsets in minutes, bad rows)
+    year, ok = _four_digits(fields['year'])
+    bad = ~ok
+    numbers = {}
+    for name in ['month', 'day', 'hour', 'minute', 'second', 'offset_hours', 'offset_minutes']:
+        numbers[name], ok = _two_digits(fields[name])
+        bad |= ~ok
+    for name, char in SEPARATORS:
+        bad |= fields[name] != ord(char)
+    sign = fields['sign']
+    bad |= (sign != ord('+')) & (sign != ord('-'))
+
+    year = year.astype(np.int32)
+    month, day = numbers['month'].astype(np.int32), numbers['day'].astype(np.int32)
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    bad |= (month < 1) | (month > 12) | (day < 1)
+    bad |= day > MONTH_DAYS[np.clip(month, 0, 12)] + ((month == 2) & leap)
+    bad |= (numbers['hour'] > 23) | (numbers['minute'] > 59) | (numbers['second'] > 59)
+    bad |= (numbers['offset_hours'] > 23) | (numbers['offset_minutes'] > 59)
+
+    offsets = numbers['offset_hours'].astype(np.int16) * 60 + numbers['offset_minutes']
+    return _days_from_civil(year, month, day), np.where(sign == ord('-'), -offsets, offsets), bad
+
+
+def parse(values):
+    # Strings (any array-like) -> (datetime64[D] trading dates, int16 UTC
+    # offsets in minutes); raises ValueError naming the first bad value
+    values = np.asarray(values)
+    try:
+        fields = np.ascontiguousarray(values.astype(f'S{WIDTH}')).reshape(-1).view(LAYOUT)
+    except UnicodeEncodeError:
+        raise ValueError("timestamps must be ASCII 'YYYY-MM-DD HH:MM:SS+HH:MM'") from None
+
+    days = np.empty(len(fields), dtype=np.int64)
+    offsets = np.empty(len(fields), dtype=np.int16)
+    for start in range(0, len(fields), CHUNK_ROWS):
+        chunk = slice(start, start + CHUNK_ROWS)
+        days[chunk], offsets[chunk], bad = _parse_chunk(fields[chunk])
+        if bad.any():
+            row = start + int(np.flatnonzero(bad)[0])
+            raise ValueError(f"row {row}: {values.ravel()[row]!r} is not a 'YYYY-MM-DD HH:MM:SS+HH:MM' timestamp")
+    return days.astype('datetime64[D]'), offsets
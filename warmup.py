@@ -0,0 +1,127 @@
+# Background warm-up at process start.
+#
+# Loads the current model of each warmed series, forecasts the next
+# WARMUP_DAYS days from today (or from the end of its training data, if that
+# is later) and every date and range listed in the warm-up manifest, so the
+# first requests after boot are served from the caches. The next days are
+# added to the series' shared forecast table, up to how far the table may be
+# extended: once a model is older than its table they are not in it, and any
+# request for some of them would otherwise be predicted live. Requests never
+# wait for the warm-up: whatever is not warm yet is answered live as usual,
+# and `status()` tells the pages how far it got.
+#
+# Manifest (warmup.json), every key optional:
+#   {"series": ["EBAY"], "dates": ["2024-12-12"], "ranges": [["2024-12-01", "2024-12-31"]]}
+
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# FORECAST_WARMUP=0 turns the warm-up off
+WARMUP_ENABLED = os.environ.get('FORECAST_WARMUP', '1') != '0'
+
+# Days from today to precompute
+WARMUP_DAYS = int(os.environ.get('FORECAST_WARMUP_DAYS', 365))
+WARMUP_MANIFEST = os.environ.get('FORECAST_WARMUP_MANIFEST', 'warmup.json')
+
+_lock = threading.Lock()
+_thread = None
+_status = {'state': 'not started', 'requests': 0, 'seconds': None}
+
+
+def status():
+    with _lock:
+        return dict(_status)
+
+
+def wait(timeout=None):
+    # Blocks until the warm-up thread (if one was started) is done; returns status()
+    if _thread is not None:
+        _thread.join(timeout)
+    return status()
+
+
+def read_manifest(path=WARMUP_MANIFEST):
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if not isinstance(manifest, dict):
+        raise ValueError(f"{path} must hold a JSON object")
+    return manifest
+
+
+def manifest_requests(manifest):
+    # One list of days per request, shaped like the ones the pages send
+    import numpy as np
+
+    requests = [np.array([day], dtype='datetime64[D]') for day in manifest.get('dates', [])]
+    for start, end in manifest.get('ranges', []):
+        requests.append(np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1))
+    return requests
+
+
+def upcoming_days(model, days, today=None):
+    # The `days` days after today, or after the training data if the model is
+    # newer than today
+    import numpy as np
+
+    today = np.datetime64(today or datetime.date.today(), 'D')
+    return max(today, model.last_day) + np.arange(1, days + 1)
+
+
+def run(days=WARMUP_DAYS, manifest_path=WARMUP_MANIFEST, today=None):
+    import forecasting
+
+    manifest = read_manifest(manifest_path)
+    requests = manifest_requests(manifest)
+    started = time.perf_counter()
+    for series_id in manifest.get('series') or [forecasting.DEFAULT_SERIES]:
+        timer = forecasting.StageTimer('warmup')
+        with forecasting.use_model(series_id, timer) as (model, model_version):
+            if days > 0:
+                with timer.stage('predict'):
+                    upcoming = upcoming_days(model, days, today)
+                    forecasting.extend_horizon(model, model_version, upcoming[-1], series_id)
+                with _lock:
+                    _status['requests'] += 1
+            for request_days in requests:
+                forecasting.forecast_dates(model, model_version, request_days, timer=timer, series_id=series_id)
+                with _lock:
+                    _status['requests'] += 1
+        timer.log(series=series_id, model_version=model_version, requests=len(requests) + (days > 0))
+    return time.perf_counter() - started
+
+
+def _run_in_background(days, manifest_path):
+    try:
+        seconds = run(days, manifest_path)
+    except Exception:
+        logger.exception("Warm-up failed; forecasts are computed on demand")
+        with _lock:
+            _status['state'] = 'failed'
+        return
+    logger.info("Warm-up finished in %.2f s", seconds)
+    with _lock:
+        _status.update(state='ready', seconds=round(seconds, 3))
+
+
+def start(days=WARMUP_DAYS, manifest_path=WARMUP_MANIFEST):
+    # Start the warm-up thread; safe to call on every Streamlit rerun, only
+    # the first call in a process starts it
+    global _thread
+    with _lock:
+        if not WARMUP_ENABLED:
+            _status['state'] = 'disabled'
+        elif _thread is None:
+            _status['state'] = 'running'
+            _thread = threading.Thread(target=_run_in_background, args=(days, manifest_path),
+                                       name='forecast-warmup', daemon=True)
+            _thread.start()
+    return _thread